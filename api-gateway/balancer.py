@@ -0,0 +1,152 @@
+import logging
+import random
+import time
+from typing import List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Request extension naming the Instance to use instead of picking one (health probes)
+PINNED_INSTANCE = "gateway_instance"
+
+
+class Instance:
+    """One upstream instance with its own connection pool and load counters"""
+
+    def __init__(self, base_url: str, transport: httpx.AsyncHTTPTransport):
+        url = httpx.URL(base_url)
+        self.base_url = base_url
+        self.scheme = url.scheme
+        self.host = url.host
+        self.port = url.port
+        self.transport = transport
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def stats(self, now: float) -> dict:
+        return {
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejected": self.is_ejected(now),
+            "ejections": self.ejections,
+        }
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body that releases its instance slot once fully read or closed"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self.stream = stream
+        self.release = release
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            self.release()
+
+
+class BalancedTransport(httpx.AsyncBaseTransport):
+    """Spread requests over several instances of one upstream.
+
+    Each request goes to the healthy instance with the fewest outstanding requests
+    (a request stays outstanding until its response body is closed, so long
+    streams count). Ties are broken randomly. Instances are ejected passively for
+    `eject_seconds` after `eject_failures` consecutive connection errors or 5xx
+    responses; if every instance is ejected, all of them are used again.
+    """
+
+    def __init__(self, base_urls: List[str], make_transport, eject_failures: int = 3, eject_seconds: float = 10.0):
+        self.instances = [Instance(url, make_transport()) for url in base_urls]
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+
+    def pick(self) -> Instance:
+        now = time.monotonic()
+        candidates = [inst for inst in self.instances if not inst.is_ejected(now)] or self.instances
+        least = min(inst.outstanding for inst in candidates)
+        return random.choice([inst for inst in candidates if inst.outstanding == least])
+
+    def record(self, instance: Instance, failed: bool):
+        if not failed:
+            instance.consecutive_failures = 0
+            return
+        instance.failures += 1
+        instance.consecutive_failures += 1
+        now = time.monotonic()
+        if instance.consecutive_failures >= self.eject_failures and not instance.is_ejected(now):
+            instance.consecutive_failures = 0
+            instance.ejected_until = now + self.eject_seconds
+            instance.ejections += 1
+            logger.warning(f"Ejecting upstream instance {instance.base_url} for {self.eject_seconds}s")
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        instance = request.extensions.get(PINNED_INSTANCE) or self.pick()
+        request.url = request.url.copy_with(scheme=instance.scheme, host=instance.host, port=instance.port)
+        request.headers["host"] = request.url.netloc.decode("ascii")
+
+        instance.outstanding += 1
+        instance.requests += 1
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                instance.outstanding -= 1
+
+        try:
+            response = await instance.transport.handle_async_request(request)
+        except httpx.TransportError:
+            release()
+            self.record(instance, failed=True)
+            raise
+        except BaseException:
+            release()
+            raise
+
+        self.record(instance, failed=response.status_code >= 500)
+        response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self):
+        for instance in self.instances:
+            await instance.transport.aclose()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {inst.base_url: inst.stats(now) for inst in self.instances}
+
+    def pools(self) -> list:
+        return [getattr(inst.transport, "_pool", None) for inst in self.instances]
+
+
+def parse_instances(value: str) -> List[str]:
+    """Split a comma-separated list of upstream base URLs"""
+    return [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+
+
+def transport_pools(client: httpx.AsyncClient) -> list:
+    """Connection pools behind a client (one per instance when balanced)"""
+    transport = client._transport
+    if isinstance(transport, BalancedTransport):
+        return transport.pools()
+    return [getattr(transport, "_pool", None)]
+
+
+def balancer_of(client: Optional[httpx.AsyncClient]) -> Optional[BalancedTransport]:
+    transport = getattr(client, "_transport", None)
+    return transport if isinstance(transport, BalancedTransport) else None
@@ -0,0 +1,81 @@
+import json
+from typing import Any, Tuple
+
+from fastapi import Request, HTTPException
+from fastapi.responses import Response
+
+from proxy import drain
+from schemas import BatchSubRequest
+
+# Upstream response headers worth returning per sub-request
+BATCH_RESPONSE_HEADERS = {"content-type", "etag", "cache-control", "location", "retry-after"}
+
+
+def build_sub_request(parent: Request, sub: BatchSubRequest, payload: dict) -> Request:
+    """Build an in-process Request for one batch entry, reusing the caller's credentials.
+
+    `payload` is the token payload the batch handler already verified (revocation
+    included); the proxy routes take it from request.state instead of verifying again.
+    """
+    path, _, query = sub.path.partition("?")
+    body = json.dumps(sub.body).encode() if sub.body is not None else b""
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        # Sub-responses are decoded into the batch document, so ask for plain bytes
+        (b"accept-encoding", b"identity"),
+    ]
+    authorization = parent.headers.get("authorization")
+    if authorization:
+        headers.append((b"authorization", authorization.encode("latin-1")))
+
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": sub.method,
+        "scheme": parent.url.scheme,
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": headers,
+        "client": parent.scope.get("client"),
+        "server": parent.scope.get("server"),
+        "app": parent.scope.get("app"),
+        "state": {"auth_payload": payload},
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return Request(scope, receive)
+
+
+async def read_response(response: Response) -> Tuple[int, dict, Any]:
+    """Drain a proxy response into (status, headers, decoded body)"""
+    raw = await drain(response)
+    headers = {
+        key: value for key, value in response.headers.items()
+        if key.lower() in BATCH_RESPONSE_HEADERS
+    }
+    return response.status_code, headers, decode_body(raw, response.headers.get("content-type", ""))
+
+
+def decode_body(raw: bytes, content_type: str) -> Any:
+    if not raw:
+        return None
+    if "json" in content_type:
+        try:
+            return json.loads(raw)
+        except ValueError:
+            pass
+    return raw.decode(errors="replace")
+
+
+def error_result(exc: HTTPException) -> Tuple[int, dict, Any]:
+    return exc.status_code, dict(exc.headers or {}), {"detail": exc.detail}
@@ -0,0 +1,82 @@
+import asyncio
+from typing import Dict, Hashable, Optional
+
+import httpx
+
+
+class SharedResponse:
+    """A fully read upstream response that can be replayed to several clients"""
+
+    def __init__(self, status_code: int, headers: dict, body: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+
+
+class Flight:
+    """One in-flight upstream call that identical requests can wait on"""
+
+    def __init__(self):
+        self.done = asyncio.Event()
+        self.result: Optional[SharedResponse] = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+    async def wait(self) -> Optional[SharedResponse]:
+        await self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """Coalesce identical concurrent GETs into one upstream call.
+
+    The first request for a key becomes the leader; requests that arrive while it is
+    in flight wait for its response instead of calling the upstream themselves. Only
+    responses with a known Content-Length up to `max_body_bytes` are shared; for
+    anything else (e.g. streamed exports) waiters fall back to their own call.
+    """
+
+    def __init__(self, max_body_bytes: int = 1_048_576):
+        self.max_body_bytes = max_body_bytes
+        self.flights: Dict[Hashable, Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.not_shareable = 0
+
+    def join(self, key: Hashable) -> Optional[Flight]:
+        """Return the in-flight call for a key, if there is one"""
+        flight = self.flights.get(key)
+        if flight is not None:
+            flight.waiters += 1
+            self.coalesced += 1
+        return flight
+
+    def lead(self, key: Hashable) -> Flight:
+        flight = Flight()
+        self.flights[key] = flight
+        self.leaders += 1
+        return flight
+
+    def shareable(self, response: httpx.Response) -> bool:
+        length = response.headers.get("content-length")
+        return length is not None and length.isdigit() and int(length) <= self.max_body_bytes
+
+    def finish(self, key: Hashable, flight: Flight, result: Optional[SharedResponse] = None, error: Optional[BaseException] = None):
+        """Publish the leader's outcome to all waiters and retire the flight"""
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+        if result is None and error is None:
+            self.not_shareable += 1
+        flight.result = result
+        flight.error = error
+        flight.done.set()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self.flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "not_shareable": self.not_shareable,
+        }
@@ -0,0 +1,151 @@
+import os
+import time
+from typing import Dict
+
+from fastapi import BackgroundTasks
+from fastapi.responses import Response
+
+# Latencies below this never count as congestion (sub-millisecond jitter)
+MIN_BASELINE_RTT = 0.005
+
+# Share of the current limit each priority may use; lower priorities are shed first
+PRIORITY_SHARES = {
+    "critical": 1.0,   # writes, e.g. POST /api/expenses
+    "default": 0.9,    # ordinary reads
+    "sheddable": 0.7,  # analytics / dashboard reads
+}
+
+
+class ConcurrencyShedError(Exception):
+    """Raised when a request is shed because its upstream is at its concurrency limit"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("concurrency limit reached")
+        self.retry_after = retry_after
+
+
+class Permit:
+    """A slot on a limiter; released exactly once"""
+
+    def __init__(self, limiter: "AdaptiveLimiter"):
+        self.limiter = limiter
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.limiter.release()
+
+    def release_after(self, response: Response) -> Response:
+        """Hold the slot until the response (including a streamed body) has been sent"""
+        tasks = BackgroundTasks()
+        if response.background is not None:
+            tasks.tasks.append(response.background)
+        tasks.add_task(self.release)
+        response.background = tasks
+        return response
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for one upstream, driven by observed latency.
+
+    The limit grows by about one per limit's worth of fast responses and is cut by
+    `backoff` when short-term latency exceeds `tolerance` times the long-term
+    baseline, or on an upstream failure (at most once per baseline RTT). Requests
+    beyond the limit are rejected immediately instead of queueing in the upstream.
+
+    Settings come from env vars prefixed with the upstream name, e.g.
+    EXPENSE_CONCURRENCY_INITIAL, falling back to CONCURRENCY_* defaults.
+    """
+
+    def __init__(self, name: str):
+        prefix = name.upper()
+
+        def setting(key: str, default: float) -> float:
+            return float(os.getenv(f"{prefix}_CONCURRENCY_{key}", os.getenv(f"CONCURRENCY_{key}", str(default))))
+
+        self.name = name
+        self.enabled = os.getenv(f"{prefix}_CONCURRENCY_ENABLED", os.getenv("CONCURRENCY_ENABLED", "true")).lower() in ("1", "true", "yes", "on")
+        self.min_limit = setting("MIN", 4)
+        self.max_limit = setting("MAX", 500)
+        self.limit = min(self.max_limit, max(self.min_limit, setting("INITIAL", 50)))
+        self.tolerance = setting("LATENCY_TOLERANCE", 2.0)
+        self.backoff = setting("BACKOFF", 0.9)
+        self.in_flight = 0
+        self.short_rtt = None
+        self.long_rtt = None
+        self.last_decrease = 0.0
+        self.accepted = 0
+        self.shed = {priority: 0 for priority in PRIORITY_SHARES}
+        self.decreases = 0
+
+    def try_acquire(self, priority: str = "default") -> bool:
+        if not self.enabled:
+            self.in_flight += 1
+            return True
+        if self.in_flight >= self.limit * PRIORITY_SHARES[priority]:
+            self.shed[priority] += 1
+            return False
+        self.in_flight += 1
+        self.accepted += 1
+        return True
+
+    def release(self):
+        self.in_flight = max(0, self.in_flight - 1)
+
+    def retry_after(self) -> float:
+        return max(1.0, (self.long_rtt or 0.0) * 2)
+
+    def sample(self, rtt: float, failed: bool = False):
+        """Feed one upstream round trip (time to response headers) into the limit"""
+        if not failed:
+            self.short_rtt = rtt if self.short_rtt is None else 0.8 * self.short_rtt + 0.2 * rtt
+            self.long_rtt = rtt if self.long_rtt is None else 0.99 * self.long_rtt + 0.01 * rtt
+
+        congested = failed or self.short_rtt > self.tolerance * max(self.long_rtt, MIN_BASELINE_RTT)
+        if congested:
+            now = time.monotonic()
+            if now - self.last_decrease >= (self.long_rtt or 0.0):
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self.last_decrease = now
+                self.decreases += 1
+        elif self.in_flight >= self.limit * 0.5:
+            # Only grow while the limit is actually being used
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "accepted": self.accepted,
+            "shed": dict(self.shed),
+            "decreases": self.decreases,
+            "rtt_ms": round(self.short_rtt * 1000, 2) if self.short_rtt is not None else None,
+            "baseline_rtt_ms": round(self.long_rtt * 1000, 2) if self.long_rtt is not None else None,
+        }
+
+
+class ConcurrencyRegistry:
+    """One adaptive limiter per upstream"""
+
+    def __init__(self):
+        self.limiters: Dict[str, AdaptiveLimiter] = {}
+
+    def register(self, name: str) -> AdaptiveLimiter:
+        limiter = AdaptiveLimiter(name)
+        self.limiters[name] = limiter
+        return limiter
+
+    def get(self, name: str) -> AdaptiveLimiter:
+        return self.limiters[name]
+
+    def acquire(self, name: str, priority: str = "default") -> Permit:
+        """Take a slot on an upstream's limiter or raise ConcurrencyShedError"""
+        limiter = self.limiters[name]
+        if not limiter.try_acquire(priority):
+            raise ConcurrencyShedError(limiter.retry_after())
+        return Permit(limiter)
+
+    def stats(self) -> dict:
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
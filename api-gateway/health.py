@@ -0,0 +1,125 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from balancer import PINNED_INSTANCE, Instance, balancer_of
+from upstreams import UNMETERED, UpstreamRegistry
+
+
+class UpstreamHealth:
+    """Last known health of one upstream"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.status = "unknown"
+        self.latency_ms: Optional[float] = None
+        self.last_checked: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self.consecutive_failures = 0
+        self.error: Optional[str] = None
+        # Per-instance status when the upstream is balanced over several instances
+        self.instances: Dict[str, str] = {}
+
+    def record(self, status: str, latency_ms: Optional[float], error: Optional[str] = None):
+        now = time.time()
+        self.status = status
+        self.latency_ms = latency_ms
+        self.last_checked = now
+        self.error = error
+        if status == "healthy":
+            self.last_success = now
+            self.consecutive_failures = 0
+        else:
+            self.consecutive_failures += 1
+
+    def to_dict(self) -> dict:
+        def iso(ts):
+            return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+        return {
+            "status": self.status,
+            "latency_ms": self.latency_ms,
+            "last_checked": iso(self.last_checked),
+            "last_success": iso(self.last_success),
+            "consecutive_failures": self.consecutive_failures,
+            "error": self.error,
+            **({"instances": dict(self.instances)} if self.instances else {}),
+        }
+
+
+class HealthProber:
+    """Probe every upstream's /health concurrently on a fixed interval.
+
+    /health serves the latest snapshot instead of probing inline, and the proxy
+    routes use `is_down()` to fail fast while an upstream is known to be down.
+    Balanced upstreams are probed instance by instance and count as healthy while
+    any instance answers, so one dead instance cannot fail the whole upstream.
+    """
+
+    def __init__(self, registry: UpstreamRegistry, interval: float = 5.0, timeout: float = 2.0, failure_threshold: int = 2):
+        self.registry = registry
+        self.interval = interval
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.state: Dict[str, UpstreamHealth] = {name: UpstreamHealth(name) for name in registry.configs}
+        self.task: Optional[asyncio.Task] = None
+
+    async def probe_instance(self, client, instance: Optional[Instance]) -> Tuple[str, Optional[float], Optional[str]]:
+        """(status, latency_ms, error) of one /health call, pinned to `instance` if given"""
+        extensions = {UNMETERED: True}
+        if instance is not None:
+            extensions[PINNED_INSTANCE] = instance
+        start = time.perf_counter()
+        try:
+            response = await client.get("/health", timeout=self.timeout, extensions=extensions)
+        except Exception as e:
+            return "unreachable", None, str(e) or e.__class__.__name__
+        latency_ms = round((time.perf_counter() - start) * 1000, 2)
+        if response.status_code == 200:
+            return "healthy", latency_ms, None
+        return "unhealthy", latency_ms, f"HTTP {response.status_code}"
+
+    async def probe(self, name: str):
+        state = self.state.setdefault(name, UpstreamHealth(name))
+        client = self.registry.get(name)
+        balancer = balancer_of(client)
+        instances = balancer.instances if balancer is not None else [None]
+        results = await asyncio.gather(*(self.probe_instance(client, instance) for instance in instances))
+        if balancer is not None:
+            state.instances = {instance.base_url: status for instance, (status, _, _) in zip(instances, results)}
+
+        healthy = [latency_ms for status, latency_ms, _ in results if status == "healthy"]
+        if healthy:
+            state.record("healthy", min(healthy))
+        else:
+            status, latency_ms, _ = results[0]
+            state.record(status, latency_ms, "; ".join(error for _, _, error in results if error))
+
+    async def probe_all(self):
+        await asyncio.gather(*(self.probe(name) for name in self.registry.configs))
+
+    async def run(self):
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def is_down(self, name: str) -> bool:
+        state = self.state.get(name)
+        return state is not None and state.consecutive_failures >= self.failure_threshold
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {name: state.to_dict() for name, state in self.state.items()}
@@ -0,0 +1,215 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, HTTPException
+from fastapi.responses import Response
+
+from proxy import drain
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_WRITE_METHODS = {"POST", "PUT", "DELETE"}
+MAX_KEY_LENGTH = 255
+IN_PROGRESS = "in_progress"
+
+# Response headers that are not stored for replay
+UNSTORED_HEADERS = {"content-length", "date", "server", "x-ratelimit-limit", "x-ratelimit-remaining", "x-ratelimit-reset"}
+
+
+class IdempotencyStore:
+    """Replay the first response of a write sent again with the same Idempotency-Key.
+
+    Records live in Redis under (user_id, key): the first request claims the key
+    with SET NX, and its response is stored for `ttl` seconds. A retry with the
+    same key gets the stored response without reaching the upstream; a retry that
+    arrives while the original is still running waits for it. 5xx responses and
+    failures release the claim so the client can retry for real. Reusing a key for
+    a different request is rejected with 422. Falls back to an in-process store
+    while Redis is unreachable.
+
+    The body is fingerprinted within the route's size cap (request.state.max_body_bytes,
+    set by the edge validator) through `body_reader`, so an oversized upload gets its
+    413 before being buffered.
+    """
+
+    def __init__(self, redis_client=None, ttl: int = 86400, lock_ttl: int = 60,
+                 wait_timeout: float = 30.0, poll_interval: float = 0.05,
+                 redis_retry_interval: float = 5.0,
+                 body_reader: Optional[Callable[[Request, int], Awaitable[bytes]]] = None):
+        self.redis = redis_client
+        self.body_reader = body_reader
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.redis_retry_interval = redis_retry_interval
+        self.redis_down_until = 0.0
+        # key -> (expires_at, raw record); used only while Redis is down
+        self.local: Dict[str, Tuple[float, str]] = {}
+        # key -> event set when the in-process original finishes
+        self.pending: Dict[str, asyncio.Event] = {}
+        self.stored = 0
+        self.replayed = 0
+        self.waited = 0
+        self.conflicts = 0
+
+    @staticmethod
+    def key(user_id: str, idempotency_key: str) -> str:
+        return f"idempotency:{user_id}:{hashlib.sha256(idempotency_key.encode()).hexdigest()}"
+
+    @staticmethod
+    def fingerprint(request: Request, body: bytes) -> str:
+        return hashlib.sha256(b"\n".join([request.method.encode(), request.url.path.encode(), request.url.query.encode(), body])).hexdigest()
+
+    async def read_body(self, request: Request) -> bytes:
+        limit = getattr(request.state, "max_body_bytes", None)
+        if limit is None or self.body_reader is None:
+            return await request.body()
+        return await self.body_reader(request, limit)
+
+    def redis_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self.redis_down_until
+
+    def redis_failed(self, e: Exception):
+        logger.warning(f"Idempotency Redis error, using in-process store: {e}")
+        self.redis_down_until = time.monotonic() + self.redis_retry_interval
+
+    def local_get(self, key: str) -> Optional[str]:
+        record = self.local.get(key)
+        if record is None:
+            return None
+        if record[0] < time.monotonic():
+            del self.local[key]
+            return None
+        return record[1]
+
+    async def claim(self, key: str, record: str) -> bool:
+        if self.redis_available():
+            try:
+                return bool(await self.redis.set(key, record, nx=True, ex=self.lock_ttl))
+            except Exception as e:
+                self.redis_failed(e)
+        if self.local_get(key) is not None:
+            return False
+        self.local[key] = (time.monotonic() + self.lock_ttl, record)
+        return True
+
+    async def get(self, key: str) -> Optional[str]:
+        if self.redis_available():
+            try:
+                return await self.redis.get(key)
+            except Exception as e:
+                self.redis_failed(e)
+        return self.local_get(key)
+
+    async def save(self, key: str, record: str):
+        self.local.pop(key, None)
+        if self.redis_available():
+            try:
+                await self.redis.set(key, record, ex=self.ttl)
+                return
+            except Exception as e:
+                self.redis_failed(e)
+        self.local[key] = (time.monotonic() + self.ttl, record)
+
+    async def release(self, key: str):
+        self.local.pop(key, None)
+        if self.redis_available():
+            try:
+                await self.redis.delete(key)
+            except Exception as e:
+                self.redis_failed(e)
+
+    async def wait_for(self, key: str) -> Optional[dict]:
+        """Wait for the original request to finish; None if its claim was released"""
+        self.waited += 1
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            event = self.pending.get(key)
+            if event is not None:
+                # Same process: wake up as soon as the original finishes
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    break
+            else:
+                await asyncio.sleep(self.poll_interval)
+            raw = await self.get(key)
+            if raw is None:
+                return None
+            record = json.loads(raw)
+            if record["state"] != IN_PROGRESS:
+                return record
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still being processed",
+            headers={"Retry-After": "1"},
+        )
+
+    def replay(self, record: dict) -> Response:
+        self.replayed += 1
+        headers = dict(record["headers"])
+        headers["idempotent-replayed"] = "true"
+        return Response(content=base64.b64decode(record["body"]), status_code=record["status_code"], headers=headers)
+
+    async def run(self, request: Request, user_id: str, forward: Callable[[], Awaitable[Response]]) -> Response:
+        """Forward a write once per (user_id, Idempotency-Key); replay the result for retries"""
+        idempotency_key = request.headers.get("idempotency-key")
+        if idempotency_key is None or request.method not in IDEMPOTENT_WRITE_METHODS:
+            return await forward()
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+        key = self.key(user_id, idempotency_key)
+        fingerprint = self.fingerprint(request, await self.read_body(request))
+        in_progress = json.dumps({"state": IN_PROGRESS, "fingerprint": fingerprint})
+
+        while not await self.claim(key, in_progress):
+            raw = await self.get(key)
+            record = json.loads(raw) if raw is not None else None
+            if record is not None and record["state"] == IN_PROGRESS:
+                record = await self.wait_for(key)
+            if record is None:
+                # The original failed and released the key; try to claim it ourselves
+                continue
+            if record["fingerprint"] != fingerprint:
+                self.conflicts += 1
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+            return self.replay(record)
+
+        event = self.pending[key] = asyncio.Event()
+        try:
+            response = await forward()
+            body = await drain(response)
+            if response.status_code >= 500:
+                await self.release(key)
+            else:
+                await self.save(key, json.dumps({
+                    "state": "completed",
+                    "fingerprint": fingerprint,
+                    "status_code": response.status_code,
+                    "headers": {name: value for name, value in response.headers.items() if name not in UNSTORED_HEADERS},
+                    "body": base64.b64encode(body).decode(),
+                }))
+                self.stored += 1
+        except BaseException:
+            await self.release(key)
+            raise
+        finally:
+            self.pending.pop(key, None)
+            event.set()
+        return Response(content=body, status_code=response.status_code, headers=dict(response.headers))
+
+    def stats(self) -> dict:
+        return {
+            "stored": self.stored,
+            "replayed": self.replayed,
+            "waited": self.waited,
+            "conflicts": self.conflicts,
+            "in_flight": len(self.pending),
+        }
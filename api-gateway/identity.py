@@ -0,0 +1,55 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import Optional
+
+# Signed internal identity header, shared verbatim by the gateway and the services.
+# The gateway verifies the user's JWT once and forwards who the caller is as
+# "<base64url(json claims)>.<base64url(hmac-sha256)>"; services check the HMAC and
+# expiry instead of decoding the JWT again or loading the user from their database.
+IDENTITY_HEADER = "X-Internal-Identity"
+IDENTITY_SECRET = os.getenv("INTERNAL_IDENTITY_SECRET") or os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
+IDENTITY_TTL = int(os.getenv("INTERNAL_IDENTITY_TTL", "30"))
+# Reject requests that carry no identity header (instead of falling back to older auth)
+IDENTITY_REQUIRED = os.getenv("INTERNAL_IDENTITY_REQUIRED", "false").lower() in ("1", "true", "yes", "on")
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _signature(body: str, secret: str) -> bytes:
+    # Never raises: a forged header may carry any character, even a lone surrogate
+    return _b64encode(hmac.new(secret.encode(), body.encode("utf-8", "surrogatepass"), hashlib.sha256).digest()).encode()
+
+
+def sign_identity(user_id: str, email: Optional[str] = None, username: Optional[str] = None,
+                  secret: str = IDENTITY_SECRET, ttl: int = IDENTITY_TTL) -> str:
+    """Build the header value for a user the gateway has already authenticated"""
+    claims = {"user_id": user_id, "email": email, "username": username, "exp": int(time.time()) + ttl}
+    body = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{body}.{_signature(body, secret).decode()}"
+
+
+def verify_identity(value: Optional[str], secret: str = IDENTITY_SECRET) -> Optional[dict]:
+    """Return the identity claims if the header is authentic and unexpired, else None"""
+    if not value or "." not in value:
+        return None
+    body, _, signature = value.partition(".")
+    # Compare bytes: compare_digest raises TypeError on non-ASCII str
+    if not hmac.compare_digest(signature.encode("utf-8", "surrogatepass"), _signature(body, secret)):
+        return None
+    try:
+        claims = json.loads(_b64decode(body))
+    except ValueError:
+        return None
+    if not isinstance(claims, dict) or not claims.get("user_id") or claims.get("exp", 0) < time.time():
+        return None
+    return claims
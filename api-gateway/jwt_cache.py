@@ -0,0 +1,80 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of already-verified JWT payloads.
+
+    Entries are keyed by a SHA-256 digest of the raw token (the token itself is never
+    stored) and expire at the token's own `exp`. Revoked tokens are dropped from the
+    cache and remembered by `jti` until they expire, so they cannot be re-admitted.
+    """
+
+    def __init__(self, max_size: int = 10_000):
+        self.max_size = max_size
+        self.entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self.revoked: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return the cached payload for a token, or None on miss/expiry"""
+        key = self.digest(token)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        payload, expires_at = entry
+        if expires_at <= time.time():
+            del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def put(self, token: str, payload: dict):
+        """Cache a verified payload until its `exp` (tokens without `exp` are not cached)"""
+        expires_at = payload.get("exp")
+        if not expires_at:
+            return
+        key = self.digest(token)
+        self.entries[key] = (payload, float(expires_at))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def is_revoked(self, payload: dict) -> bool:
+        jti = payload.get("jti")
+        return bool(jti) and jti in self.revoked
+
+    def revoke(self, token: str, payload: Optional[dict] = None):
+        """Invalidate a token and block its jti until it expires"""
+        self.entries.pop(self.digest(token), None)
+        if payload and payload.get("jti"):
+            now = time.time()
+            self.revoked = {jti: exp for jti, exp in self.revoked.items() if exp > now}
+            self.revoked[payload["jti"]] = float(payload.get("exp") or now + 86400)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "revoked": len(self.revoked),
+        }
@@ -1,22 +1,150 @@
 from fastapi import FastAPI, Request, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import httpx
+import logging
 import os
 from jose import jwt, JWTError
 from typing import Optional
-import redis
+import redis.asyncio as aioredis
 import time
+import asyncio
 from datetime import datetime, timezone
+from contextlib import asynccontextmanager
+from urllib.parse import urlencode
+from upstreams import UNMETERED, UpstreamRegistry
+from proxy import UpstreamFailure, stream_proxy, upstream_url
+from ratelimit import RateLimiter, RateLimitHeadersMiddleware
+from jwt_cache import VerifiedTokenCache
+from health import HealthProber
+from resilience import ResilienceRegistry, CircuitOpenError
+from coalesce import SingleFlight
+from concurrency import ConcurrencyRegistry, ConcurrencyShedError, Permit
+from response_cache import ResponseCache
+from idempotency import IdempotencyStore
+from validation import EdgeRoute, EdgeValidator
+from batch import build_sub_request, read_response, error_result
+from identity import IDENTITY_HEADER, sign_identity
+from tracing import TracingMiddleware, inject, log_context, start_child, tracer
+from jsonlog import configure_logging, json_logging
+from metrics import MetricsRegistry, MetricsMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE
 from schemas import (
     UserRegistration, UserLogin, TokenRefresh, UserProfileUpdate,
-    RegistrationResponse, LoginResponse
+    RegistrationResponse, LoginResponse,
+    BatchRequest, BatchSubRequest, BatchSubResponse, BatchResponse
 )
 
+configure_logging("api-gateway", context=log_context)
+logger = logging.getLogger(__name__)
+
+# Service URLs
+AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8001")
+EXPENSE_SERVICE_URL = os.getenv("EXPENSE_SERVICE_URL", "http://expense-service:8002")
+ANALYTICS_SERVICE_URL = os.getenv("ANALYTICS_SERVICE_URL", "http://analytics-service:8003")
+NOTIFICATION_SERVICE_URL = os.getenv("NOTIFICATION_SERVICE_URL", "http://notification-service:8004")
+
+# Metrics
+metrics = MetricsRegistry()
+requests_total = metrics.counter(
+    "gateway_requests_total", "Requests handled by the gateway", ("route", "method", "status")
+)
+request_duration = metrics.histogram(
+    "gateway_request_duration_seconds", "Gateway request latency", ("route", "method")
+)
+upstream_duration = metrics.histogram(
+    "gateway_upstream_duration_seconds", "Time until upstream response headers", ("upstream", "status")
+)
+rate_limit_rejections = metrics.counter(
+    "gateway_rate_limit_rejections_total", "Requests rejected by the rate limiter", ("group",)
+)
+
+
+def upstream_hooks(name: str) -> dict:
+    """httpx event hooks recording per-upstream latency and propagating the trace"""
+    async def on_request(request: httpx.Request):
+        # Probes and schema fetches would drag the latency baseline below real traffic
+        if not request.extensions.get(UNMETERED):
+            request.extensions["gateway_start"] = time.perf_counter()
+        span = start_child(f"{request.method} {name}", "client", {"http.method": request.method, "http.url": str(request.url), "peer.service": name})
+        request.extensions["trace_span"] = span
+        inject(request.headers, span)
+
+    async def on_response(response: httpx.Response):
+        start = response.request.extensions.get("gateway_start")
+        if start is not None:
+            elapsed = time.perf_counter() - start
+            upstream_duration.observe(elapsed, name, str(response.status_code))
+            concurrency.get(name).sample(elapsed, failed=response.status_code >= 500)
+        span = response.request.extensions.get("trace_span")
+        if span is not None:
+            span.set_attribute("http.status_code", response.status_code)
+            span.end()
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+# Pooled upstream clients, one per service
+upstreams = UpstreamRegistry(event_hooks=upstream_hooks)
+upstreams.register("auth", AUTH_SERVICE_URL)
+upstreams.register("expense", EXPENSE_SERVICE_URL)
+upstreams.register("analytics", ANALYTICS_SERVICE_URL)
+upstreams.register("notification", NOTIFICATION_SERVICE_URL)
+
+# Circuit breakers, retry budgets and hedged reads per route group
+resilience = ResilienceRegistry()
+resilience.register("auth", max_retries=1)
+resilience.register("expenses", max_retries=2)
+resilience.register("analytics", max_retries=2, hedge=True)
+resilience.register("notifications", max_retries=0)
+
+# Adaptive concurrency limit per upstream; excess requests are shed with 503
+concurrency = ConcurrencyRegistry()
+for name in upstreams.configs:
+    concurrency.register(name)
+
+# Identical concurrent GETs share one upstream call
+single_flight = SingleFlight(max_body_bytes=int(os.getenv("COALESCE_MAX_BODY_BYTES", "1048576")))
+
+# Route group whose resilience policy applies to each upstream
+UPSTREAM_GROUPS = {
+    "auth": "auth",
+    "expense": "expenses",
+    "analytics": "analytics",
+    "notification": "notifications",
+}
+
+# Background health probing of all upstreams
+health_prober = HealthProber(
+    upstreams,
+    interval=float(os.getenv("HEALTH_PROBE_INTERVAL", "5")),
+    timeout=float(os.getenv("HEALTH_PROBE_TIMEOUT", "2")),
+    failure_threshold=int(os.getenv("HEALTH_FAILURE_THRESHOLD", "2")),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the upstream connection pools on startup and drain them on shutdown"""
+    await upstreams.start()
+    health_prober.start()
+    edge_validator.start(upstreams)
+    try:
+        await redis_client.ping()
+        logger.info("Connected to Redis!")
+    except Exception as e:
+        logger.warning(f"Redis connection failed, using in-process rate limiting: {e}")
+    yield
+    await edge_validator.stop()
+    await health_prober.stop()
+    await upstreams.close()
+    await redis_client.aclose()
+
+
 app = FastAPI(
     title="Smart Expense Tracker - API Gateway",
     description="API Gateway for microservices-based expense tracker",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware conf
@@ -27,59 +155,170 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-# Service URLs
-AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:8001")
-EXPENSE_SERVICE_URL = os.getenv("EXPENSE_SERVICE_URL", "http://expense-service:8002")
-ANALYTICS_SERVICE_URL = os.getenv("ANALYTICS_SERVICE_URL", "http://analytics-service:8003")
-NOTIFICATION_SERVICE_URL = os.getenv("NOTIFICATION_SERVICE_URL", "http://notification-service:8004")
+app.add_middleware(RateLimitHeadersMiddleware)
+app.add_middleware(MetricsMiddleware, requests_total=requests_total, request_duration=request_duration)
+# Outermost: the gateway starts every trace and forwards it to upstreams (see upstream_hooks)
+tracer.configure("api-gateway")
+app.add_middleware(TracingMiddleware, trust_incoming=False)
 
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+
+token_cache = VerifiedTokenCache(max_size=JWT_CACHE_SIZE)
 
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
 
-try:
-    redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
-    redis_client.ping()
-    print("Connected to Redis!")
-except Exception as e:
-    print(f"Redis connection failed: {e}")
-    redis_client = None
+# Async client: connects lazily, so an unavailable Redis never blocks startup
+redis_client = aioredis.Redis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=0,
+    decode_responses=True,
+    socket_connect_timeout=0.5,
+    socket_timeout=0.5,
+)
+rate_limiter = RateLimiter(redis_client)
+
+# Optional shared response cache (Redis + in-process L1), driven by upstream Cache-Control
+response_cache = ResponseCache(
+    redis_client,
+    enabled=os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() in ("1", "true", "yes", "on"),
+    l1_size=int(os.getenv("RESPONSE_CACHE_L1_SIZE", "1000")),
+    max_body_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BODY_BYTES", "1048576")),
+)
+
+# Body-size caps and schema validation of proxied writes, applied before any upstream work
+WRITE_BODY_LIMIT = int(os.getenv("BODY_LIMIT_WRITE", "16384"))
+edge_validator = EdgeValidator(
+    [
+        EdgeRoute("POST", r"^/api/expenses$", "expense", "ExpenseCreate", WRITE_BODY_LIMIT),
+        EdgeRoute("PUT", r"^/api/expenses/\d+$", "expense", "ExpenseUpdate", WRITE_BODY_LIMIT),
+        EdgeRoute("POST", r"^/api/analytics/budget$", "analytics", "BudgetCreate", WRITE_BODY_LIMIT),
+        # Bulk imports stream straight through to the expense service, which validates each row
+        EdgeRoute("POST", r"^/api/expenses/import$", "expense", None, int(os.getenv("BODY_LIMIT_IMPORT", "52428800"))),
+    ],
+    body_limits={
+        "expense": int(os.getenv("BODY_LIMIT_EXPENSES", "1048576")),
+        "analytics": int(os.getenv("BODY_LIMIT_ANALYTICS", "65536")),
+        "notification": int(os.getenv("BODY_LIMIT_NOTIFICATIONS", "65536")),
+    },
+    default_limit=int(os.getenv("BODY_LIMIT_DEFAULT", "65536")),
+    retry_interval=float(os.getenv("EDGE_SCHEMA_RETRY_INTERVAL", "10")),
+)
+
+# Writes sent with an Idempotency-Key are forwarded once and replayed for retries
+idempotency = IdempotencyStore(
+    redis_client,
+    ttl=int(os.getenv("IDEMPOTENCY_TTL", "86400")),
+    wait_timeout=float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "30")),
+    body_reader=edge_validator.read_body,
+)
 
 
 # Rate limiting
-async def rate_limit(request: Request):
-    """Simple rate limiting: 100 requests per minute per IP"""
-    if redis_client is None:
-        return # skip reate limiting if redis is not available
-    
-    client_ip = request.client.host
-    key = f"rate_limit:{client_ip}"
-    
-    try:
-        current = redis_client.get(key)
-        if current is None:
-            redis_client.setex(key, 60, 1)
-        else:
-            if int(current) >= 100:
-                raise HTTPException(status_code=429, detail="Too many requests. Please try again later.")
-            redis_client.incr(key)
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Rate limiting error: {e}")
+async def rate_limit(request: Request, group: Optional[str] = None, payload: Optional[dict] = None, ip: bool = True):
+    """Token-bucket rate limiting per IP, per user and per route group.
+
+    Authenticated routes call it twice: with no arguments before the token is
+    verified (so bad tokens still cost the IP), then with `ip=False` and the
+    payload to charge the user and group buckets.
+    """
+    user_id = str(payload.get("user_id")) if payload and payload.get("user_id") else None
+    client_ip = request.client.host if request.client else "unknown"
+    result = await rate_limiter.check(client_ip, group=group, user_id=user_id, ip=ip)
+    if result is None:
+        return
+    # Report the tightest of the quotas charged for this request
+    previous = getattr(request.state, "rate_limit", None)
+    if previous is None or not result.allowed or result.remaining <= previous.remaining:
+        request.state.rate_limit = result
+    if not result.allowed:
+        rate_limit_rejections.inc(group or "default")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests. Please try again later.",
+            headers=result.headers()
+        )
 
 
 # JWT token validation
 def verify_token(token: str) -> dict:
-    """Verify JWT token and return payload"""
+    """Verify JWT token and return payload (cached until the token's exp)"""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if token_cache.is_revoked(payload):
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    token_cache.put(token, payload)
+    return payload
+
+def ensure_upstream_available(name: str, service_name: str):
+    """Fail fast while the health prober reports an upstream as down"""
+    if health_prober.is_down(name):
+        raise HTTPException(status_code=503, detail=f"{service_name} unavailable", headers={"Retry-After": str(int(health_prober.interval))})
+
+def request_priority(name: str, method: str) -> str:
+    """Shedding priority: writes first, analytics reads last"""
+    if method not in ("GET", "HEAD", "OPTIONS"):
+        return "critical"
+    return "sheddable" if name == "analytics" else "default"
+
+def acquire_slot(name: str, method: str, service_name: str, priority: Optional[str] = None) -> Permit:
+    """Take a concurrency slot on an upstream or shed the request with 503"""
+    try:
+        return concurrency.acquire(name, priority or request_priority(name, method))
+    except ConcurrencyShedError as e:
+        raise HTTPException(status_code=503, detail=f"{service_name} is overloaded, please retry", headers={"Retry-After": str(int(e.retry_after))})
+
+async def hold_slot(permit: Permit, proxy) -> Response:
+    """Await a proxy call and keep the slot until its response has been streamed"""
+    try:
+        response = await proxy
+    except UpstreamFailure:
+        # The upstream call itself failed: that is a congestion signal for the limiter
+        permit.limiter.sample(0.0, failed=True)
+        permit.release()
+        raise
+    except BaseException:
+        # Gateway-made 503s (open breaker, fail-fast) never reached the upstream: no sample
+        permit.release()
+        raise
+    return permit.release_after(response)
+
+async def call_upstream(name: str, method: str, url: str, service_name: str = "User service", priority: Optional[str] = None, **kwargs) -> httpx.Response:
+    """Send a buffered request to an upstream through its concurrency limit and resilience policy"""
+    ensure_upstream_available(name, service_name)
+    permit = acquire_slot(name, method, service_name, priority)
+    client = upstreams.get(name)
+    try:
+        return await resilience.get(UPSTREAM_GROUPS[name]).send(
+            client, client.build_request(method, url, **kwargs), stream=False
+        )
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=f"{service_name} unavailable", headers={"Retry-After": str(int(e.retry_after))})
+    except httpx.RequestError as e:
+        permit.limiter.sample(0.0, failed=True)
+        raise HTTPException(status_code=503, detail=f"{service_name} unavailable: {str(e)}")
+    finally:
+        permit.release()
+
+def flight_key(request: Request, url: str, payload: dict):
+    """Single-flight key for a proxied GET: (method, path, query, user_id) plus client validators"""
+    if request.method != "GET":
+        return None
+    return (
+        request.method,
+        url,
+        str(payload.get("user_id", "")),
+        request.headers.get("if-none-match"),
+        request.headers.get("if-modified-since"),
+    )
 
 def get_token_from_header(request: Request) -> Optional[str]:
     """Extract token from Authorization header"""
@@ -88,6 +327,19 @@ def get_token_from_header(request: Request) -> Optional[str]:
         return auth_header.split(" ")[1]
     return None
 
+def token_payload(request: Request, token: str) -> dict:
+    """The caller's verified token payload; batch sub-requests carry the one the batch verified"""
+    payload = getattr(request.state, "auth_payload", None)
+    return payload if payload is not None else verify_token(token)
+
+def identity_headers(token: str, payload: dict) -> dict:
+    """Credentials forwarded upstream: the JWT, the user id and the signed internal identity"""
+    return {
+        "Authorization": f"Bearer {token}",
+        "X-User-ID": str(payload.get("user_id", "")),
+        IDENTITY_HEADER: sign_identity(str(payload.get("user_id", "")), payload.get("email"), payload.get("username")),
+    }
+
 @app.get("/")
 async def root():
     """Gateway health check"""
@@ -105,79 +357,197 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Check health of all services"""
-    services_health = {}
-    
-    async with httpx.AsyncClient(timeout=5.0) as client:
-        try:
-            response = await client.get(f"{AUTH_SERVICE_URL}/health")
-            services_health["auth_service"] = "healthy" if response.status_code == 200 else "unhealthy"
-        except:
-            services_health["auth_service"] = "unreachable"
-        
-        try:
-            response = await client.get(f"{EXPENSE_SERVICE_URL}/health")
-            services_health["expense_service"] = "healthy" if response.status_code == 200 else "unhealthy"
-        except:
-            services_health["expense_service"] = "unreachable"
-        
-        try:
-            response = await client.get(f"{ANALYTICS_SERVICE_URL}/health")
-            services_health["analytics_service"] = "healthy" if response.status_code == 200 else "unhealthy"
-        except:
-            services_health["analytics_service"] = "unreachable"
-        
-        try:
-            response = await client.get(f"{NOTIFICATION_SERVICE_URL}/health")
-            services_health["notification_service"] = "healthy" if response.status_code == 200 else "unhealthy"
-        except:
-            services_health["notification_service"] = "unreachable"
-    
+    """Check health of all services (latest background probe results)"""
+    snapshot = health_prober.snapshot()
     return {
         "gateway": "healthy",
-        "services": services_health,
+        "services": {f"{name}_service": state["status"] for name, state in snapshot.items()},
+        "details": snapshot,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+
+@app.get("/health/pools")
+async def pool_stats():
+    """Connection pool statistics per upstream (in-use, idle, waiting, per-instance load)"""
+    return {
+        "pools": upstreams.stats(),
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
 
 
+def collect_pool_stats():
+    for name, stats in upstreams.stats().items():
+        for key in ("connections", "in_use", "idle", "waiting"):
+            if stats is not None:
+                yield (name, key), stats[key]
+
+
+def collect_instance_stats():
+    for name, stats in upstreams.stats().items():
+        for instance, counters in ((stats or {}).get("instances") or {}).items():
+            for key in ("outstanding", "requests", "failures", "ejected", "ejections"):
+                yield (name, instance, key), int(counters[key])
+
+
+def collect_concurrency_stats():
+    for name, stats in concurrency.stats().items():
+        yield (name, "limit"), stats["limit"]
+        yield (name, "in_flight"), stats["in_flight"]
+        for priority, count in stats["shed"].items():
+            yield (name, f"shed_{priority}"), count
+
+
+def collect_resilience_stats():
+    states = {"closed": 0, "half_open": 1, "open": 2}
+    for group, stats in resilience.stats().items():
+        yield (group, "circuit_state"), states[stats["circuit_state"]]
+        for key in ("circuit_opens", "requests", "failures", "retries", "retry_budget_exhausted", "hedges", "hedge_wins", "short_circuited"):
+            yield (group, key), stats[key]
+
+
+metrics.gauge_callback(
+    "gateway_upstream_pool", "Upstream connection pool state", ("upstream", "state"), collect_pool_stats
+)
+metrics.gauge_callback(
+    "gateway_upstream_instance", "Load balancer state per upstream instance", ("upstream", "instance", "stat"),
+    collect_instance_stats
+)
+metrics.gauge_callback(
+    "gateway_concurrency", "Adaptive concurrency limit, in-flight and shed requests per upstream", ("upstream", "stat"),
+    collect_concurrency_stats
+)
+metrics.gauge_callback(
+    "gateway_jwt_cache", "Verified-JWT cache statistics", ("stat",),
+    lambda: (((key,), value) for key, value in token_cache.stats().items())
+)
+metrics.gauge_callback(
+    "gateway_resilience", "Circuit breaker (0 closed, 1 half-open, 2 open), retry and hedge counters", ("group", "stat"),
+    collect_resilience_stats
+)
+metrics.gauge_callback(
+    "gateway_coalescing", "Single-flight request coalescing counters", ("stat",),
+    lambda: (((key,), value) for key, value in single_flight.stats().items())
+)
+metrics.gauge_callback(
+    "gateway_response_cache", "Response cache counters (hits, revalidations, bytes saved)", ("stat",),
+    lambda: (((key,), value) for key, value in response_cache.stats().items() if key != "enabled")
+)
+metrics.gauge_callback(
+    "gateway_edge_rejected", "Proxied writes rejected at the edge", ("reason",),
+    lambda: ((("size",), edge_validator.rejected_size), (("invalid",), edge_validator.rejected_invalid))
+)
+metrics.gauge_callback(
+    "gateway_log_queue", "Log records waiting for the writer thread, and records dropped", ("stat",),
+    lambda: (((key,), value) for key, value in json_logging.stats().items())
+)
+metrics.gauge_callback(
+    "gateway_upstream_up", "Last background health probe (1 healthy)", ("upstream",),
+    lambda: (((name,), 1 if state["status"] == "healthy" else 0) for name, state in health_prober.snapshot().items())
+)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 # Auth-service routes
 @app.post("/api/auth/register", response_model=RegistrationResponse)
 async def register_user(user_data: UserRegistration, request: Request):
     """Forward registration request to User Service"""
-    await rate_limit(request)
+    await rate_limit(request, "auth")
     
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            response = await client.post(f"{AUTH_SERVICE_URL}/api/auth/register", json=user_data.dict())
-            return JSONResponse(content=response.json(), status_code=response.status_code)
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"User service unavailable: {str(e)}")
+    response = await call_upstream("auth", "POST", "/api/auth/register", json=user_data.dict())
+    return JSONResponse(content=response.json(), status_code=response.status_code)
 
 
 @app.post("/api/auth/login", response_model=LoginResponse)
 async def login_user(user_data: UserLogin, request: Request):
     """Forward login request to User Service"""
-    await rate_limit(request)
+    await rate_limit(request, "auth")
     
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            response = await client.post(f"{AUTH_SERVICE_URL}/api/auth/login", json=user_data.dict())
-            return JSONResponse(content=response.json(), status_code=response.status_code)
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"User service unavailable: {str(e)}")
+    response = await call_upstream("auth", "POST", "/api/auth/login", json=user_data.dict())
+    return JSONResponse(content=response.json(), status_code=response.status_code)
 
 
 @app.post("/api/auth/refresh")
 async def refresh_token(token_data: TokenRefresh, request: Request):
     """Forward token refresh request to User Service"""
+    await rate_limit(request, "auth")
+    
+    response = await call_upstream("auth", "POST", "/api/auth/refresh", json=token_data.dict())
+    return JSONResponse(content=response.json(), status_code=response.status_code)
+
+
+@app.post("/api/auth/logout")
+async def logout_user(request: Request):
+    """Forward logout request to User Service and revoke the access token at the gateway"""
     await rate_limit(request)
+    token = get_token_from_header(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Authorization token required")
+    
+    payload = verify_token(token)
+    await rate_limit(request, "auth", payload, ip=False)
+    
+    response = await call_upstream(
+        "auth",
+        "POST",
+        "/api/auth/logout",
+        content=await request.body(),
+        headers={
+            **identity_headers(token, payload),
+            "Content-Type": request.headers.get("Content-Type", "application/json")
+        }
+    )
     
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            response = await client.post(f"{AUTH_SERVICE_URL}/api/auth/refresh", json=token_data.dict())
-            return JSONResponse(content=response.json(), status_code=response.status_code)
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"User service unavailable: {str(e)}")
+    if response.is_success:
+        token_cache.revoke(token, payload)
+    return JSONResponse(content=response.json(), status_code=response.status_code)
+
+
+@app.get("/health/resilience")
+async def resilience_stats():
+    """Circuit breaker, retry and hedging statistics per route group"""
+    return resilience.stats()
+
+
+@app.get("/health/coalescing")
+async def coalescing_stats():
+    """Single-flight statistics (requests coalesced onto an in-flight GET)"""
+    return single_flight.stats()
+
+
+@app.get("/health/concurrency")
+async def concurrency_stats():
+    """Adaptive concurrency limits, in-flight requests and shed counts per upstream"""
+    return concurrency.stats()
+
+
+@app.get("/health/idempotency")
+async def idempotency_stats():
+    """Idempotency-Key statistics (stored, replayed, waited, conflicts)"""
+    return idempotency.stats()
+
+
+@app.get("/health/validation")
+async def validation_stats():
+    """Edge validation statistics (schema source per route, rejected bodies)"""
+    return edge_validator.stats()
+
+
+@app.get("/health/response-cache")
+async def response_cache_stats():
+    """Response cache statistics (hit ratio, bytes saved)"""
+    return response_cache.stats()
+
+
+@app.get("/health/jwt-cache")
+async def jwt_cache_stats():
+    """Verified-JWT cache statistics (hits, misses, size)"""
+    return token_cache.stats()
 
 
 @app.get("/api/users/profile")
@@ -188,17 +558,16 @@ async def get_user_profile(request: Request):
     if not token:
         raise HTTPException(status_code=401, detail="Authorization token required")
     
-    verify_token(token)
+    payload = token_payload(request, token)
+    await rate_limit(request, "users", payload, ip=False)
     
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            response = await client.get(
-                f"{AUTH_SERVICE_URL}/api/users/profile",
-                headers={"Authorization": f"Bearer {token}"}
-            )
-            return JSONResponse(content=response.json(), status_code=response.status_code)
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"User service unavailable: {str(e)}")
+    response = await call_upstream(
+        "auth",
+        "GET",
+        "/api/users/profile",
+        headers=identity_headers(token, payload)
+    )
+    return JSONResponse(content=response.json(), status_code=response.status_code)
 
 
 @app.put("/api/users/profile")
@@ -209,18 +578,17 @@ async def update_user_profile(profile_data: UserProfileUpdate, request: Request)
     if not token:
         raise HTTPException(status_code=401, detail="Authorization token required")
     
-    verify_token(token)
+    payload = verify_token(token)
+    await rate_limit(request, "users", payload, ip=False)
     
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            response = await client.put(
-                f"{AUTH_SERVICE_URL}/api/users/profile",
-                json=profile_data.dict(exclude_unset=True),
-                headers={"Authorization": f"Bearer {token}"}
-            )
-            return JSONResponse(content=response.json(), status_code=response.status_code)
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"User service unavailable: {str(e)}")
+    response = await call_upstream(
+        "auth",
+        "PUT",
+        "/api/users/profile",
+        json=profile_data.dict(exclude_unset=True),
+        headers=identity_headers(token, payload)
+    )
+    return JSONResponse(content=response.json(), status_code=response.status_code)
 
 
 
@@ -232,43 +600,35 @@ async def forward_to_expense_service(request: Request, path: str = ""):
     if not token:
         raise HTTPException(status_code=401, detail="Authorization token required")
     
-    payload = verify_token(token) 
-    
-    # Get request body if present
-    body = None
-    if request.method in ["POST", "PUT"]:
-        body = await request.json()
+    payload = token_payload(request, token)
+    await rate_limit(request, "expenses", payload, ip=False)
     
-    # Build URL with query parameters
-    url = f"{EXPENSE_SERVICE_URL}/api/expenses"
-    if path:
-        url += f"/{path}"
-    if request.url.query:
-        url += f"?{request.url.query}"
+    url = upstream_url("/api/expenses", path, request.url.query)
     
-    print("url is: ", url)
-    print("token is: ", token)
-    print("payload is: ", payload)
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            response = await client.request(
-                method=request.method,
-                url=url,
-                json=body,
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "X-User-ID": str(payload.get("user_id", ""))
-                }
-            )
-            return JSONResponse(content=response.json(), status_code=response.status_code)
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Expense service unavailable: {str(e)}")
+    await edge_validator.check(request, "expense")
+    ensure_upstream_available("expense", "Expense service")
+
+    async def forward():
+        permit = acquire_slot("expense", request.method, "Expense service")
+        return await hold_slot(permit, stream_proxy(
+            upstreams.get("expense"),
+            request,
+            url,
+            headers=identity_headers(token, payload),
+            service_name="Expense service",
+            policy=resilience.get(UPSTREAM_GROUPS["expense"]),
+            single_flight=single_flight,
+            flight_key=flight_key(request, url, payload),
+            cache=response_cache,
+            cache_user=str(payload.get("user_id", ""))
+        ))
+
+    return await idempotency.run(request, str(payload.get("user_id", "")), forward)
 
 
 @app.api_route("/api/expenses", methods=["GET", "POST", "PUT", "DELETE"])
 async def expense_service_proxy_base(request: Request):
     """Forward requests to /api/expenses (base endpoint)"""
-    print("forwarding request to /api/expenses.........")
     return await forward_to_expense_service(request, "")
 
 
@@ -287,34 +647,30 @@ async def analytics_service_proxy(request: Request, path: str):
     if not token:
         raise HTTPException(status_code=401, detail="Authorization token required")
     
-    payload = verify_token(token) 
+    payload = token_payload(request, token)
+    await rate_limit(request, "analytics", payload, ip=False)
     
-    # Get request body if present
-    body = None
-    if request.method in ["POST", "PUT"]:
-        body = await request.json()
+    url = upstream_url("/api/analytics", path, request.url.query)
     
-    # Build URL with query parameters
-    url = f"{ANALYTICS_SERVICE_URL}/api/analytics"
-    if path:
-        url += f"/{path}"
-    if request.url.query:
-        url += f"?{request.url.query}"
-    
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            response = await client.request(
-                method=request.method,
-                url=url,
-                json=body,
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "X-User-ID": str(payload.get("user_id", ""))
-                }
-            )
-            return JSONResponse(content=response.json(), status_code=response.status_code)
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Analytics service unavailable: {str(e)}")
+    await edge_validator.check(request, "analytics")
+    ensure_upstream_available("analytics", "Analytics service")
+
+    async def forward():
+        permit = acquire_slot("analytics", request.method, "Analytics service")
+        return await hold_slot(permit, stream_proxy(
+            upstreams.get("analytics"),
+            request,
+            url,
+            headers=identity_headers(token, payload),
+            service_name="Analytics service",
+            policy=resilience.get(UPSTREAM_GROUPS["analytics"]),
+            single_flight=single_flight,
+            flight_key=flight_key(request, url, payload),
+            cache=response_cache,
+            cache_user=str(payload.get("user_id", ""))
+        ))
+
+    return await idempotency.run(request, str(payload.get("user_id", "")), forward)
 
 
 # Notification-service routes
@@ -326,34 +682,128 @@ async def notification_service_proxy(request: Request, path: str):
     if not token:
         raise HTTPException(status_code=401, detail="Authorization token required")
     
-    payload = verify_token(token)  
+    payload = token_payload(request, token)
+    await rate_limit(request, "notifications", payload, ip=False)
+    
+    url = upstream_url("/api/notifications", path, request.url.query)
+    
+    await edge_validator.check(request, "notification")
+    ensure_upstream_available("notification", "Notification service")
+
+    async def forward():
+        permit = acquire_slot("notification", request.method, "Notification service")
+        return await hold_slot(permit, stream_proxy(
+            upstreams.get("notification"),
+            request,
+            url,
+            headers=identity_headers(token, payload),
+            service_name="Notification service",
+            policy=resilience.get(UPSTREAM_GROUPS["notification"]),
+            single_flight=single_flight,
+            flight_key=flight_key(request, url, payload),
+            cache=response_cache,
+            cache_user=str(payload.get("user_id", ""))
+        ))
+
+    return await idempotency.run(request, str(payload.get("user_id", "")), forward)
+
+
+# Dashboard route
+DASHBOARD_SECTION_TIMEOUT = float(os.getenv("DASHBOARD_SECTION_TIMEOUT", "3"))
+
+
+async def fetch_dashboard_section(name: str, upstream: str, service_name: str, url: str, headers: dict):
+    """Fetch one dashboard section; failures are reported instead of raised"""
+    start = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(
+            call_upstream(upstream, "GET", url, service_name, priority="sheddable", headers=headers),
+            timeout=DASHBOARD_SECTION_TIMEOUT
+        )
+        if response.is_success:
+            data, error = response.json(), None
+        else:
+            data, error = None, f"{service_name} returned {response.status_code}"
+    except asyncio.TimeoutError:
+        data, error = None, f"{service_name} timed out"
+    except HTTPException as e:
+        data, error = None, e.detail
+    except ValueError:
+        data, error = None, f"{service_name} returned an invalid body"
+    return name, data, error, (time.perf_counter() - start) * 1000
+
+
+@app.get("/api/dashboard")
+async def get_dashboard(request: Request, limit: int = 10):
+    """Recent expenses, spending summary, category breakdown and budget status in one call.
+
+    Sections are fetched concurrently; a failing section is reported under
+    `errors` while the others are still returned.
+    """
+    await rate_limit(request)
+    token = get_token_from_header(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Authorization token required")
+    
+    payload = verify_token(token)
+    await rate_limit(request, None, payload, ip=False)
     
-    # Get request body if present
-    body = None
-    if request.method in ["POST", "PUT"]:
-        body = await request.json()
+    headers = identity_headers(token, payload)
+    analytics_query = urlencode(
+        [(key, value) for key, value in request.query_params.items() if key in ("start_date", "end_date")]
+    )
+    sections = await asyncio.gather(
+        fetch_dashboard_section("recent_expenses", "expense", "Expense service", f"/api/expenses?limit={limit}", headers),
+        fetch_dashboard_section("summary", "analytics", "Analytics service", upstream_url("/api/analytics/summary", "", analytics_query), headers),
+        fetch_dashboard_section("by_category", "analytics", "Analytics service", upstream_url("/api/analytics/by-category", "", analytics_query), headers),
+        fetch_dashboard_section("budget_status", "analytics", "Analytics service", "/api/analytics/budget-status", headers),
+    )
+    
+    document = {name: data for name, data, _, _ in sections}
+    document["errors"] = {name: error for name, _, error, _ in sections if error}
+    document["timestamp"] = datetime.now(timezone.utc).isoformat()
+    server_timing = ", ".join(f"{name};dur={duration:.1f}" for name, _, _, duration in sections)
+    return JSONResponse(content=document, headers={"Server-Timing": server_timing})
+
+
+# Batch route
+async def dispatch_sub_request(request: Request, sub: BatchSubRequest, payload: dict) -> BatchSubResponse:
+    """Run one batch entry through the matching proxy route"""
+    sub_request = build_sub_request(request, sub, payload)
+    path = sub_request.url.path
+    try:
+        if path == "/api/expenses" or path.startswith("/api/expenses/"):
+            response = await forward_to_expense_service(sub_request, path[len("/api/expenses/"):])
+        elif path.startswith("/api/analytics/"):
+            response = await analytics_service_proxy(sub_request, path[len("/api/analytics/"):])
+        elif path.startswith("/api/notifications/"):
+            response = await notification_service_proxy(sub_request, path[len("/api/notifications/"):])
+        elif path == "/api/users/profile" and sub.method == "GET":
+            response = await get_user_profile(sub_request)
+        else:
+            raise HTTPException(status_code=404, detail=f"Unsupported batch route: {sub.method} {path}")
+        status_code, headers, body = await read_response(response)
+    except HTTPException as e:
+        status_code, headers, body = error_result(e)
+    return BatchSubResponse(id=sub.id, status=status_code, headers=headers, body=body)
+
+
+@app.post("/api/batch", response_model=BatchResponse)
+async def batch_requests(batch: BatchRequest, request: Request):
+    """Run several API calls concurrently in one round trip.
+
+    The token is verified once; each sub-request is rate limited individually and
+    returns its own status and body.
+    """
+    await rate_limit(request)
+    token = get_token_from_header(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Authorization token required")
     
-    # Build URL with query parameters
-    url = f"{NOTIFICATION_SERVICE_URL}/api/notifications"
-    if path:
-        url += f"/{path}"
-    if request.url.query:
-        url += f"?{request.url.query}"
+    payload = verify_token(token)
     
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            response = await client.request(
-                method=request.method,
-                url=url,
-                json=body,
-                headers={
-                    "Authorization": f"Bearer {token}",
-                    "X-User-ID": str(payload.get("user_id", ""))
-                }
-            )
-            return JSONResponse(content=response.json(), status_code=response.status_code)
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=503, detail=f"Notification service unavailable: {str(e)}")
+    responses = await asyncio.gather(*(dispatch_sub_request(request, sub, payload) for sub in batch.requests))
+    return BatchResponse(responses=list(responses))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,280 @@
+import httpx
+from fastapi import Request, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Callable, Hashable, Optional, Union
+from coalesce import SharedResponse, SingleFlight
+from resilience import CircuitOpenError, UpstreamPolicy
+from response_cache import CacheEntry, ResponseCache
+from validation import limited_stream
+
+# Connection-scoped headers that must not be forwarded by a proxy (RFC 9110 7.6.1)
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+
+# Request headers the gateway sets itself
+GATEWAY_MANAGED_HEADERS = HOP_BY_HOP_HEADERS | {"host", "authorization", "x-user-id", "x-internal-identity"}
+
+
+class UpstreamFailure(HTTPException):
+    """A 503 caused by a failed upstream call, as opposed to one the gateway decided on itself"""
+
+    def __init__(self, service_name: str, error: Exception):
+        super().__init__(status_code=503, detail=f"{service_name} unavailable: {str(error)}")
+
+
+def forwardable_request_headers(request: Request, extra: Optional[dict] = None) -> dict:
+    """Inbound headers that can be passed to an upstream, plus gateway headers"""
+    headers = {
+        key: value for key, value in request.headers.items()
+        if key.lower() not in GATEWAY_MANAGED_HEADERS
+    }
+    # Otherwise httpx advertises its own encodings and the upstream may compress a
+    # body (e.g. an export stream) that is relayed raw to a client that never asked
+    headers.setdefault("accept-encoding", "identity")
+    if extra:
+        # Inbound keys are lowercase; drop the client's copy of anything the gateway sets
+        # (e.g. the cache's If-None-Match) so it is not sent twice under different cases
+        overridden = {key.lower() for key in extra}
+        headers = {key: value for key, value in headers.items() if key not in overridden}
+        headers.update(extra)
+    return headers
+
+
+def forwardable_response_headers(response: httpx.Response) -> dict:
+    """Upstream response headers that can be passed back to the client"""
+    return {
+        key: value for key, value in response.headers.items()
+        if key.lower() not in HOP_BY_HOP_HEADERS
+    }
+
+
+def upstream_url(prefix: str, path: str, query: str) -> str:
+    """Build the upstream path for a proxied request"""
+    url = prefix
+    if path:
+        url += f"/{path}"
+    if query:
+        url += f"?{query}"
+    return url
+
+
+async def send_upstream(
+    client: httpx.AsyncClient,
+    request: Request,
+    url: str,
+    headers: Optional[dict] = None,
+    service_name: str = "Upstream service",
+    policy: Optional[UpstreamPolicy] = None,
+) -> httpx.Response:
+    """Open a streamed upstream request carrying the inbound body as chunks"""
+    content = None
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        limit = getattr(request.state, "max_body_bytes", None)
+        content = limited_stream(request, limit) if limit is not None else request.stream()
+    upstream_request = client.build_request(
+        method=request.method,
+        url=url,
+        content=content,
+        headers=forwardable_request_headers(request, headers),
+    )
+    try:
+        if policy is not None:
+            return await policy.send(client, upstream_request, stream=True)
+        return await client.send(upstream_request, stream=True)
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"{service_name} unavailable",
+            headers={"Retry-After": str(int(e.retry_after))},
+        )
+    except httpx.RequestError as e:
+        raise UpstreamFailure(service_name, e)
+
+
+def relay(upstream_response: httpx.Response) -> StreamingResponse:
+    """Relay a streamed upstream response untouched"""
+    return StreamingResponse(
+        upstream_response.aiter_raw(),
+        status_code=upstream_response.status_code,
+        headers=forwardable_response_headers(upstream_response),
+        background=BackgroundTask(upstream_response.aclose),
+    )
+
+
+def replay(shared: SharedResponse) -> Response:
+    """Send a buffered, shared upstream response to one client"""
+    return Response(content=shared.body, status_code=shared.status_code, headers=shared.headers)
+
+
+async def drain(response: Response) -> bytes:
+    """Read a gateway response body into memory, running its background task"""
+    if not isinstance(response, StreamingResponse):
+        if response.background is not None:
+            await response.background()
+        return response.body
+    chunks = []
+    try:
+        async for chunk in response.body_iterator:
+            chunks.append(chunk if isinstance(chunk, bytes) else chunk.encode())
+    finally:
+        if response.background is not None:
+            await response.background()
+    return b"".join(chunks)
+
+
+async def read_shared(upstream_response: httpx.Response, service_name: str) -> SharedResponse:
+    """Read the raw (still encoded) upstream body so it can be replayed as-is"""
+    try:
+        body = b"".join([chunk async for chunk in upstream_response.aiter_raw()])
+    except httpx.RequestError as e:
+        raise UpstreamFailure(service_name, e)
+    finally:
+        await upstream_response.aclose()
+    return SharedResponse(
+        upstream_response.status_code,
+        forwardable_response_headers(upstream_response),
+        body,
+    )
+
+
+async def fetch(
+    client: httpx.AsyncClient,
+    request: Request,
+    url: str,
+    headers: Optional[dict],
+    service_name: str,
+    policy: Optional[UpstreamPolicy],
+    single_flight: Optional[SingleFlight] = None,
+    flight_key: Optional[Hashable] = None,
+    buffer_if: Optional[Callable[[httpx.Response], bool]] = None,
+) -> Union[SharedResponse, httpx.Response]:
+    """Call the upstream, coalescing GETs that have a `flight_key`.
+
+    Returns a SharedResponse when the body was buffered (coalesced, or accepted by
+    `buffer_if`), otherwise the still-open streamed httpx.Response.
+    """
+    if single_flight is not None and flight_key is not None and request.method == "GET":
+        flight = single_flight.join(flight_key)
+        if flight is None:
+            return await lead_flight(client, request, url, headers, service_name, policy, single_flight, flight_key)
+        try:
+            shared = await flight.wait()
+        except UpstreamFailure as e:
+            # Only the leader called the upstream; its failure is sampled once, by the leader
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        if shared is not None:
+            return shared
+        # The leader's response could not be shared; make our own call
+
+    upstream_response = await send_upstream(client, request, url, headers, service_name, policy)
+    if buffer_if is not None and buffer_if(upstream_response):
+        return await read_shared(upstream_response, service_name)
+    return upstream_response
+
+
+async def lead_flight(client, request, url, headers, service_name, policy, single_flight, flight_key):
+    flight = single_flight.lead(flight_key)
+    try:
+        upstream_response = await send_upstream(client, request, url, headers, service_name, policy)
+        if not single_flight.shareable(upstream_response):
+            single_flight.finish(flight_key, flight)
+            return upstream_response
+        shared = await read_shared(upstream_response, service_name)
+    except HTTPException as e:
+        single_flight.finish(flight_key, flight, error=e)
+        raise
+    except BaseException:
+        single_flight.finish(flight_key, flight)
+        raise
+    single_flight.finish(flight_key, flight, result=shared)
+    return shared
+
+
+async def revalidate(
+    cache: ResponseCache,
+    client: httpx.AsyncClient,
+    url: str,
+    headers: dict,
+    policy: Optional[UpstreamPolicy],
+    user_id: str,
+    entry: CacheEntry,
+):
+    """Background refresh of a stale cache entry; `headers` carry its validator"""
+    upstream_request = client.build_request("GET", url, headers=headers)
+    if policy is not None:
+        upstream_response = await policy.send(client, upstream_request, stream=True)
+    else:
+        upstream_response = await client.send(upstream_request, stream=True)
+    if upstream_response.status_code == 304:
+        await upstream_response.aclose()
+        await cache.refresh(url, user_id, entry, upstream_response.headers)
+    elif cache.storable(upstream_response):
+        shared = await read_shared(upstream_response, "Upstream service")
+        await cache.store(url, user_id, entry.vary, shared)
+    else:
+        await upstream_response.aclose()
+
+
+async def stream_proxy(
+    client: httpx.AsyncClient,
+    request: Request,
+    url: str,
+    headers: Optional[dict] = None,
+    service_name: str = "Upstream service",
+    policy: Optional[UpstreamPolicy] = None,
+    single_flight: Optional[SingleFlight] = None,
+    flight_key: Optional[Hashable] = None,
+    cache: Optional[ResponseCache] = None,
+    cache_user: Optional[str] = None,
+) -> Response:
+    """Stream a request to an upstream and its response back, without buffering.
+
+    The inbound body is forwarded chunk by chunk and the upstream bytes are relayed
+    untouched (including Content-Encoding), so memory per request stays constant and
+    nothing is parsed or re-encoded at the edge. GETs with a `flight_key` are
+    coalesced through `single_flight`, and served from / stored in `cache` when the
+    upstream allows it.
+    """
+    use_cache = cache is not None and cache.enabled and request.method == "GET"
+    if not use_cache:
+        result = await fetch(client, request, url, headers, service_name, policy, single_flight, flight_key)
+        return replay(result) if isinstance(result, SharedResponse) else relay(result)
+
+    user_id = cache_user or ""
+    entry = await cache.lookup(url, user_id, request.headers)
+    if entry is not None:
+        if entry.is_fresh():
+            return cache.serve(entry, request, "HIT")
+        if entry.is_usable_stale():
+            cache.revalidate_in_background(
+                cache.key(url, "public" if entry.shared else f"user:{user_id}"),
+                lambda: revalidate(cache, client, url, forwardable_request_headers(
+                    request, {**(headers or {}), "If-None-Match": entry.etag} if entry.etag else headers
+                ), policy, user_id, entry),
+            )
+            return cache.serve(entry, request, "STALE")
+        if entry.etag:
+            headers = {**(headers or {}), "If-None-Match": entry.etag}
+            flight_key = flight_key + (entry.etag,) if flight_key is not None else None
+
+    result = await fetch(client, request, url, headers, service_name, policy, single_flight, flight_key, cache.storable)
+    if entry is not None and result.status_code == 304:
+        if isinstance(result, httpx.Response):
+            await result.aclose()
+        entry = await cache.refresh(url, user_id, entry, result.headers)
+        return cache.serve(entry, request, "REVALIDATED")
+    if isinstance(result, SharedResponse):
+        await cache.store(url, user_id, request.headers, result)
+        response = replay(result)
+        response.headers["x-cache"] = "MISS"
+        return response
+    return relay(result)
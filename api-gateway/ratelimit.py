@@ -0,0 +1,207 @@
+import logging
+import math
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Token bucket checked and consumed for every key in one atomic server-side step.
+# KEYS: bucket keys; ARGV: capacity and refill window (ms) per key, in KEYS order.
+# A request is allowed only if every bucket has a token; then all buckets are charged.
+TOKEN_BUCKET_LUA = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local allowed = 1
+local retry_after = 0
+local remaining = -1
+local limit = 0
+local reset = 0
+local tokens = {}
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local window = tonumber(ARGV[2 * i])
+    local rate = capacity / window
+    local state = redis.call('HMGET', KEYS[i], 't', 'ts')
+    local t = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    t = math.min(capacity, t + math.max(0, now - ts) * rate)
+    tokens[i] = t
+    if t < 1 then
+        allowed = 0
+        local wait = math.ceil((1 - t) / rate)
+        if wait > retry_after then retry_after = wait end
+    end
+    local left = math.max(0, math.floor(t - 1))
+    if remaining < 0 or left < remaining then
+        remaining = left
+        limit = capacity
+        reset = math.ceil((capacity - math.max(0, t - 1)) / rate)
+    end
+end
+for i = 1, #KEYS do
+    local window = tonumber(ARGV[2 * i])
+    local t = tokens[i]
+    if allowed == 1 then t = t - 1 end
+    redis.call('HSET', KEYS[i], 't', tostring(t), 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], window)
+end
+return {allowed, remaining, limit, retry_after, reset}
+"""
+
+
+class Quota:
+    """A token bucket of `limit` requests refilled over `window` seconds"""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> Optional["Quota"]:
+        """Parse '100/60' (requests/seconds); empty or '0' disables the quota"""
+        if not value or value.strip() in ("0", "off", "none"):
+            return None
+        limit, _, window = value.partition("/")
+        return cls(int(limit), float(window or 60))
+
+
+class RateLimitResult:
+    """Outcome of one limiter check, rendered as X-RateLimit-* headers"""
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset: float, retry_after: float = 0.0):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(0, self.remaining)),
+            "X-RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class LocalTokenBuckets:
+    """In-process fallback with the same semantics as the Redis script.
+
+    Only used while Redis is unreachable, so limits are per gateway process.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+
+    def check(self, buckets: List[Tuple[str, Quota]]) -> RateLimitResult:
+        now = time.monotonic()
+        if len(self.buckets) > self.max_keys:
+            self.buckets.clear()
+
+        allowed, retry_after, remaining, limit, reset = True, 0.0, None, 0, 0.0
+        refilled = []
+        for key, quota in buckets:
+            rate = quota.limit / quota.window
+            tokens, ts = self.buckets.get(key, (quota.limit, now))
+            tokens = min(quota.limit, tokens + (now - ts) * rate)
+            refilled.append(tokens)
+            if tokens < 1:
+                allowed = False
+                retry_after = max(retry_after, (1 - tokens) / rate)
+            left = max(0, math.floor(tokens - 1))
+            if remaining is None or left < remaining:
+                remaining, limit = left, quota.limit
+                reset = (quota.limit - max(0.0, tokens - 1)) / rate
+
+        for (key, _), tokens in zip(buckets, refilled):
+            self.buckets[key] = (tokens - 1 if allowed else tokens, now)
+        return RateLimitResult(allowed, limit, remaining or 0, reset, retry_after)
+
+
+class RateLimiter:
+    """Atomic, single round-trip Redis rate limiter with per-IP, per-user and per-route-group quotas.
+
+    Falls back to in-process buckets while Redis is down and retries Redis after
+    `redis_retry_interval` seconds.
+    """
+
+    def __init__(self, redis_client=None, redis_retry_interval: float = 5.0):
+        self.redis = redis_client
+        self.redis_retry_interval = redis_retry_interval
+        self.redis_down_until = 0.0
+        self.local = LocalTokenBuckets()
+        self.script = redis_client.register_script(TOKEN_BUCKET_LUA) if redis_client is not None else None
+
+        self.ip_quota = Quota.parse(os.getenv("RATE_LIMIT_IP", "100/60"))
+        self.user_quota = Quota.parse(os.getenv("RATE_LIMIT_USER", "300/60"))
+        self.group_quotas: Dict[str, Optional[Quota]] = {
+            "auth": Quota.parse(os.getenv("RATE_LIMIT_AUTH", "20/60")),
+            "users": Quota.parse(os.getenv("RATE_LIMIT_USERS", "60/60")),
+            "expenses": Quota.parse(os.getenv("RATE_LIMIT_EXPENSES", "200/60")),
+            "analytics": Quota.parse(os.getenv("RATE_LIMIT_ANALYTICS", "120/60")),
+            "notifications": Quota.parse(os.getenv("RATE_LIMIT_NOTIFICATIONS", "30/60")),
+        }
+
+    def buckets_for(self, client_ip: str, group: Optional[str], user_id: Optional[str],
+                    ip: bool = True) -> List[Tuple[str, Quota]]:
+        buckets = []
+        if ip and self.ip_quota:
+            buckets.append((f"rate_limit:ip:{client_ip}", self.ip_quota))
+        if user_id and self.user_quota:
+            buckets.append((f"rate_limit:user:{user_id}", self.user_quota))
+        group_quota = self.group_quotas.get(group) if group else None
+        if group_quota:
+            subject = f"user:{user_id}" if user_id else f"ip:{client_ip}"
+            buckets.append((f"rate_limit:{group}:{subject}", group_quota))
+        return buckets
+
+    async def check(self, client_ip: str, group: Optional[str] = None, user_id: Optional[str] = None,
+                    ip: bool = True) -> Optional[RateLimitResult]:
+        """Charge the IP (unless `ip` is False), user and group buckets in one step"""
+        buckets = self.buckets_for(client_ip, group, user_id, ip)
+        if not buckets:
+            return None
+
+        if self.script is not None and time.monotonic() >= self.redis_down_until:
+            args = []
+            for _, quota in buckets:
+                args.extend([quota.limit, int(quota.window * 1000)])
+            try:
+                allowed, remaining, limit, retry_after_ms, reset_ms = await self.script(
+                    keys=[key for key, _ in buckets], args=args
+                )
+                return RateLimitResult(bool(allowed), int(limit), int(remaining), reset_ms / 1000, retry_after_ms / 1000)
+            except Exception as e:
+                logger.warning(f"Rate limiting error, using in-process limiter: {e}")
+                self.redis_down_until = time.monotonic() + self.redis_retry_interval
+
+        return self.local.check(buckets)
+
+
+class RateLimitHeadersMiddleware:
+    """Add X-RateLimit-* headers recorded by the limiter to successful responses"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                result = scope.get("state", {}).get("rate_limit")
+                if result is not None and result.allowed:
+                    headers = list(message.get("headers", []))
+                    headers.extend(
+                        (key.lower().encode("latin-1"), value.encode("latin-1"))
+                        for key, value in result.headers().items()
+                    )
+                    message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
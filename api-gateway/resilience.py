@@ -0,0 +1,291 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import httpx
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a request is short-circuited by an open breaker"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("circuit open")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 10.0, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_in_flight = 0
+        self.opens = 0
+        self.rejections = 0
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                self.rejections += 1
+                return False
+            self.state = self.HALF_OPEN
+            self.half_open_in_flight = 0
+        if self.state == self.HALF_OPEN:
+            if self.half_open_in_flight >= self.half_open_max_calls:
+                self.rejections += 1
+                return False
+            self.half_open_in_flight += 1
+        return True
+
+    def record_success(self):
+        if self.state == self.HALF_OPEN:
+            self.state = self.CLOSED
+            self.half_open_in_flight = 0
+        self.failures = 0
+
+    def record_failure(self):
+        if self.state == self.HALF_OPEN:
+            self.trip()
+            return
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.trip()
+
+    def release(self):
+        """Give back a half-open probe slot for a call that never completed"""
+        if self.state == self.HALF_OPEN and self.half_open_in_flight > 0:
+            self.half_open_in_flight -= 1
+
+    def trip(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.failures = 0
+        self.half_open_in_flight = 0
+        self.opens += 1
+
+    def retry_after(self) -> float:
+        return max(1.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+
+
+class RetryBudget:
+    """Allow retries (and hedges) only up to a fraction of recent traffic.
+
+    Within a sliding `window` the number of extra attempts may not exceed
+    `min_per_second * window + ratio * requests`, so retries cannot amplify an outage.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, window: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+        self.requests = deque()
+        self.retries = deque()
+        self.exhausted = 0
+
+    def prune(self, now: float):
+        cutoff = now - self.window
+        while self.requests and self.requests[0] < cutoff:
+            self.requests.popleft()
+        while self.retries and self.retries[0] < cutoff:
+            self.retries.popleft()
+
+    def record_request(self):
+        now = time.monotonic()
+        self.prune(now)
+        self.requests.append(now)
+
+    def can_retry(self) -> bool:
+        self.prune(time.monotonic())
+        allowed = self.min_per_second * self.window + self.ratio * len(self.requests)
+        if len(self.retries) < allowed:
+            return True
+        self.exhausted += 1
+        return False
+
+    def record_retry(self):
+        self.retries.append(time.monotonic())
+
+
+class LatencyWindow:
+    """Ring buffer of recent successful latencies (seconds) for percentile estimates"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _discard(tasks: set):
+    """Cancel losing attempts and close any response that arrived before the cancel"""
+    for task in tasks:
+        task.cancel()
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(result, httpx.Response):
+            await result.aclose()
+
+
+class UpstreamPolicy:
+    """Circuit breaker, bounded retries and hedged GETs for one route group.
+
+    Settings come from env vars prefixed with the group name, e.g.
+    EXPENSES_MAX_RETRIES=2 or ANALYTICS_HEDGE=true.
+    """
+
+    def __init__(self, group: str, max_retries: int = 1, hedge: bool = False):
+        prefix = group.upper()
+        self.group = group
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv(f"{prefix}_BREAKER_FAILURES", "5")),
+            recovery_timeout=float(os.getenv(f"{prefix}_BREAKER_RECOVERY", "10")),
+            half_open_max_calls=int(os.getenv(f"{prefix}_BREAKER_HALF_OPEN_CALLS", "1")),
+        )
+        self.budget = RetryBudget(
+            ratio=float(os.getenv(f"{prefix}_RETRY_BUDGET_RATIO", "0.2")),
+            min_per_second=float(os.getenv(f"{prefix}_RETRY_BUDGET_MIN_PER_SECOND", "1")),
+        )
+        self.max_retries = int(os.getenv(f"{prefix}_MAX_RETRIES", str(max_retries)))
+        self.retry_backoff = float(os.getenv(f"{prefix}_RETRY_BACKOFF", "0.05"))
+        self.hedge = os.getenv(f"{prefix}_HEDGE", str(hedge)).lower() in ("1", "true", "yes", "on")
+        self.hedge_percentile = float(os.getenv(f"{prefix}_HEDGE_PERCENTILE", "0.95"))
+        self.latency = LatencyWindow()
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.short_circuited = 0
+
+    async def send(self, client: httpx.AsyncClient, request: httpx.Request, stream: bool = True) -> httpx.Response:
+        """Send a request through the breaker, retrying idempotent requests within budget"""
+        idempotent = request.method in IDEMPOTENT_METHODS
+        self.requests += 1
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.short_circuited += 1
+                raise CircuitOpenError(self.breaker.retry_after())
+
+            start = time.perf_counter()
+            response, error = None, None
+            try:
+                if idempotent and self.hedge:
+                    response = await self.send_hedged(client, request, stream)
+                else:
+                    response = await client.send(request, stream=stream)
+            except httpx.RequestError as e:
+                error = e
+            except BaseException:
+                self.breaker.release()
+                raise
+
+            if response is not None and response.status_code < 500:
+                self.breaker.record_success()
+                self.latency.record(time.perf_counter() - start)
+                return response
+
+            self.failures += 1
+            self.breaker.record_failure()
+            if not (idempotent and attempt < self.max_retries and self.budget.can_retry()):
+                if response is not None:
+                    return response
+                raise error
+
+            if response is not None:
+                await response.aclose()
+            attempt += 1
+            self.retries += 1
+            self.budget.record_retry()
+            await asyncio.sleep(self.retry_backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+
+    async def send_hedged(self, client: httpx.AsyncClient, request: httpx.Request, stream: bool) -> httpx.Response:
+        """Fire a second copy of a slow GET once it exceeds the observed latency percentile"""
+        delay = self.latency.percentile(self.hedge_percentile)
+        if delay is None:
+            return await client.send(request, stream=stream)
+
+        primary = asyncio.ensure_future(client.send(request, stream=stream))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self.budget.can_retry():
+            return await primary
+
+        self.hedges += 1
+        self.budget.record_retry()
+        # A request of its own: the event hooks keep per-attempt state (start time,
+        # trace span) in extensions, which the primary is still using. GETs carry no body.
+        hedge_request = client.build_request(request.method, request.url, headers=request.headers)
+        hedge = asyncio.ensure_future(client.send(hedge_request, stream=stream))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = None
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = task
+                    else:
+                        await task.result().aclose()
+                if winner is not None:
+                    if winner is hedge:
+                        self.hedge_wins += 1
+                    return winner.result()
+            raise error
+        finally:
+            await _discard(pending)
+
+    def stats(self) -> dict:
+        p95 = self.latency.percentile(0.95)
+        return {
+            "circuit_state": self.breaker.state,
+            "circuit_opens": self.breaker.opens,
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "retry_budget_exhausted": self.budget.exhausted,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "short_circuited": self.short_circuited,
+            "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+        }
+
+
+class ResilienceRegistry:
+    """Per-route-group upstream policies"""
+
+    def __init__(self):
+        self.policies: Dict[str, UpstreamPolicy] = {}
+
+    def register(self, group: str, **defaults) -> UpstreamPolicy:
+        policy = UpstreamPolicy(group, **defaults)
+        self.policies[group] = policy
+        return policy
+
+    def get(self, group: str) -> UpstreamPolicy:
+        return self.policies[group]
+
+    def stats(self) -> dict:
+        return {group: policy.stats() for group, policy in self.policies.items()}
@@ -0,0 +1,276 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from coalesce import SharedResponse
+
+logger = logging.getLogger(__name__)
+
+# Status codes whose responses the gateway stores
+CACHEABLE_STATUS = {200, 203}
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Parse a Cache-Control header into {directive: argument}"""
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else None
+    return directives
+
+
+def _seconds(directives: dict, name: str) -> Optional[int]:
+    value = directives.get(name)
+    return int(value) if value is not None and value.isdigit() else None
+
+
+class CacheEntry:
+    """A stored upstream response plus the freshness data needed to serve it"""
+
+    def __init__(self, status_code: int, headers: dict, body: bytes, stored_at: float,
+                 max_age: int, stale_while_revalidate: int, shared: bool,
+                 vary: Dict[str, Optional[str]]):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.stored_at = stored_at
+        self.max_age = max_age
+        self.stale_while_revalidate = stale_while_revalidate
+        self.shared = shared
+        self.vary = vary
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.headers.get("etag")
+
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    def is_fresh(self) -> bool:
+        return self.age() < self.max_age
+
+    def is_usable_stale(self) -> bool:
+        return self.age() < self.max_age + self.stale_while_revalidate
+
+    def is_usable(self) -> bool:
+        """Servable now, or at least revalidatable with If-None-Match"""
+        return self.is_usable_stale() or self.etag is not None
+
+    def matches(self, request_headers) -> bool:
+        """True if the request selects this variant (Vary)"""
+        return all(request_headers.get(name) == value for name, value in self.vary.items())
+
+    def ttl(self) -> int:
+        return max(1, int(self.max_age + self.stale_while_revalidate - self.age()))
+
+    def dumps(self) -> str:
+        return json.dumps({
+            "status_code": self.status_code,
+            "headers": self.headers,
+            "body": base64.b64encode(self.body).decode(),
+            "stored_at": self.stored_at,
+            "max_age": self.max_age,
+            "stale_while_revalidate": self.stale_while_revalidate,
+            "shared": self.shared,
+            "vary": self.vary,
+        })
+
+    @classmethod
+    def loads(cls, raw: str) -> "CacheEntry":
+        data = json.loads(raw)
+        data["body"] = base64.b64decode(data["body"])
+        return cls(**data)
+
+
+class ResponseCache:
+    """Shared HTTP cache for proxied GETs: small in-process L1 in front of Redis.
+
+    Freshness comes only from upstream Cache-Control (s-maxage/max-age,
+    stale-while-revalidate); responses without it are never stored. `public`
+    responses are shared between users, everything else is scoped to the user_id.
+    Stale entries with an ETag are revalidated with If-None-Match.
+    """
+
+    def __init__(self, redis_client=None, enabled: bool = False, l1_size: int = 1000,
+                 max_body_bytes: int = 1_048_576, redis_retry_interval: float = 5.0):
+        self.redis = redis_client
+        self.enabled = enabled
+        self.l1_size = l1_size
+        self.max_body_bytes = max_body_bytes
+        self.redis_retry_interval = redis_retry_interval
+        self.redis_down_until = 0.0
+        self.l1: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.revalidating = set()
+        self.lookups = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.revalidated = 0
+        self.stores = 0
+        self.bytes_saved = 0
+
+    @staticmethod
+    def key(url: str, scope: str) -> str:
+        return f"http_cache:{scope}:{hashlib.sha256(url.encode()).hexdigest()}"
+
+    def keys(self, url: str, user_id: str) -> List[str]:
+        return [self.key(url, f"user:{user_id}"), self.key(url, "public")]
+
+    def redis_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self.redis_down_until
+
+    def redis_failed(self, e: Exception):
+        logger.warning(f"Response cache Redis error: {e}")
+        self.redis_down_until = time.monotonic() + self.redis_retry_interval
+
+    async def lookup(self, url: str, user_id: str, request_headers) -> Optional[CacheEntry]:
+        """Find a stored variant for this user (private first, then public)"""
+        self.lookups += 1
+        keys = self.keys(url, user_id)
+        for key in keys:
+            entry = self.l1.get(key)
+            if entry is not None and entry.is_usable() and entry.matches(request_headers):
+                self.l1.move_to_end(key)
+                return entry
+
+        if not self.redis_available():
+            return None
+        try:
+            raws = await self.redis.mget(keys)
+        except Exception as e:
+            self.redis_failed(e)
+            return None
+        for key, raw in zip(keys, raws):
+            if raw is None:
+                continue
+            entry = CacheEntry.loads(raw)
+            if entry.is_usable() and entry.matches(request_headers):
+                self.remember(key, entry)
+                return entry
+        return None
+
+    def remember(self, key: str, entry: CacheEntry):
+        self.l1[key] = entry
+        self.l1.move_to_end(key)
+        while len(self.l1) > self.l1_size:
+            self.l1.popitem(last=False)
+
+    def storable(self, response) -> bool:
+        """Whether an upstream response (httpx or shared) may be stored"""
+        if response.status_code not in CACHEABLE_STATUS:
+            return False
+        directives = parse_cache_control(response.headers.get("cache-control"))
+        if "no-store" in directives or response.headers.get("vary", "").strip() == "*":
+            return False
+        if _seconds(directives, "s-maxage") is None and _seconds(directives, "max-age") is None:
+            return False
+        length = response.headers.get("content-length")
+        if isinstance(response, SharedResponse):
+            return len(response.body) <= self.max_body_bytes
+        return length is not None and length.isdigit() and int(length) <= self.max_body_bytes
+
+    def build_entry(self, shared: SharedResponse, request_headers) -> CacheEntry:
+        directives = parse_cache_control(shared.headers.get("cache-control"))
+        is_public = "public" in directives or "s-maxage" in directives
+        max_age = _seconds(directives, "s-maxage")
+        if max_age is None:
+            max_age = _seconds(directives, "max-age") or 0
+        if "no-cache" in directives:
+            max_age = 0
+        swr = 0 if "must-revalidate" in directives else (_seconds(directives, "stale-while-revalidate") or 0)
+        vary_names = [name.strip().lower() for name in shared.headers.get("vary", "").split(",") if name.strip()]
+        return CacheEntry(
+            status_code=shared.status_code,
+            headers=dict(shared.headers),
+            body=shared.body,
+            stored_at=time.time(),
+            max_age=max_age,
+            stale_while_revalidate=swr,
+            shared=is_public,
+            vary={name: request_headers.get(name) for name in vary_names},
+        )
+
+    async def store(self, url: str, user_id: str, request_headers, shared: SharedResponse) -> Optional[CacheEntry]:
+        if not self.storable(shared):
+            return None
+        entry = self.build_entry(shared, request_headers)
+        await self.save(url, user_id, entry)
+        return entry
+
+    async def save(self, url: str, user_id: str, entry: CacheEntry):
+        key = self.key(url, "public" if entry.shared else f"user:{user_id}")
+        self.remember(key, entry)
+        self.stores += 1
+        if entry.max_age + entry.stale_while_revalidate <= 0 and not entry.etag:
+            return
+        if self.redis_available():
+            try:
+                await self.redis.set(key, entry.dumps(), ex=entry.ttl() if entry.etag is None else max(entry.ttl(), 3600))
+            except Exception as e:
+                self.redis_failed(e)
+
+    async def refresh(self, url: str, user_id: str, entry: CacheEntry, not_modified_headers) -> CacheEntry:
+        """Apply a 304 Not Modified: keep the body, take the new validators and freshness"""
+        headers = dict(entry.headers)
+        for name in ("cache-control", "etag", "expires", "last-modified", "vary"):
+            if name in not_modified_headers:
+                headers[name] = not_modified_headers[name]
+        refreshed = self.build_entry(SharedResponse(entry.status_code, headers, entry.body), entry.vary)
+        refreshed.vary = entry.vary
+        self.revalidated += 1
+        await self.save(url, user_id, refreshed)
+        return refreshed
+
+    def serve(self, entry: CacheEntry, request: Request, state: str) -> Response:
+        """Replay a stored entry (or 304 if the client already has it)"""
+        if state in ("HIT", "STALE"):
+            self.hits += 1
+            if state == "STALE":
+                self.stale_hits += 1
+        if state != "MISS":
+            self.bytes_saved += len(entry.body)
+
+        headers = dict(entry.headers)
+        headers["age"] = str(int(entry.age()))
+        headers["x-cache"] = state
+        if entry.etag and request.headers.get("if-none-match") == entry.etag:
+            headers.pop("content-length", None)
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, status_code=entry.status_code, headers=headers)
+
+    def revalidate_in_background(self, key: str, revalidate: Callable[[], Awaitable[None]]):
+        """Refresh a stale entry once, off the request path"""
+        if key in self.revalidating:
+            return
+
+        async def run():
+            try:
+                await revalidate()
+            except Exception as e:
+                logger.warning(f"Background revalidation failed: {e}")
+            finally:
+                self.revalidating.discard(key)
+
+        self.revalidating.add(key)
+        asyncio.ensure_future(run())
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "l1_size": len(self.l1),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "revalidated": self.revalidated,
+            "stores": self.stores,
+            "bytes_saved": self.bytes_saved,
+            "hit_ratio": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+        }
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 class UserRegistration(BaseModel):
@@ -46,3 +46,42 @@ class RegistrationResponse(BaseModel):
     message: str
     user: UserProfileResponse
     tokens: TokenResponse
+
+class BatchSubRequest(BaseModel):
+    id: Optional[str] = None
+    method: str = Field("GET", pattern="^(GET|POST|PUT|DELETE)$")
+    path: str = Field(..., pattern="^/api/")
+    body: Optional[Any] = None
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest] = Field(..., min_length=1, max_length=20)
+
+class BatchSubResponse(BaseModel):
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchSubResponse]
+
+# Request bodies of the expense and analytics services, mirrored for edge validation.
+# Replaced at startup by the upstream OpenAPI schemas when those can be fetched.
+class ExpenseCreate(BaseModel):
+    amount: float = Field(..., gt=0)
+    category_id: int
+    description: Optional[str] = None
+    date: Optional[datetime] = None
+
+class ExpenseUpdate(BaseModel):
+    amount: Optional[float] = Field(None, gt=0)
+    category_id: Optional[int] = None
+    description: Optional[str] = None
+    date: Optional[datetime] = None
+
+class BudgetCreate(BaseModel):
+    category_id: Optional[int] = None
+    amount: float = Field(..., gt=0)
+    period: str = Field(..., pattern="^(monthly|yearly)$")
+    start_date: datetime
+    end_date: datetime
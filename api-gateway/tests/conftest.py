@@ -0,0 +1,49 @@
+from typing import Optional
+
+import pytest
+from fastapi import Request
+
+
+class Clock:
+    """Stands in for the `time` module of the code under test so tests control the clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    perf_counter = time = monotonic
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def make_request():
+    """Build an inbound starlette Request the way the ASGI server would"""
+    def make(method: str = "GET", path: str = "/", headers: Optional[dict] = None, body: bytes = b"") -> Request:
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if sent:
+                return {"type": "http.disconnect"}
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        return Request({
+            "type": "http",
+            "method": method,
+            "path": path,
+            "query_string": b"",
+            "headers": [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()],
+            "client": ("203.0.113.7", 50000),
+        }, receive)
+
+    return make
@@ -0,0 +1,127 @@
+import asyncio
+
+import httpx
+
+import balancer
+from balancer import PINNED_INSTANCE, BalancedTransport
+
+URLS = ["http://expense-1:8000", "http://expense-2:8000", "http://expense-3:8000"]
+
+
+class Body(httpx.AsyncByteStream):
+    """A raw upstream body, unread until the client streams it (like a real transport's)"""
+
+    async def __aiter__(self):
+        yield b"{}"
+
+
+class Upstreams:
+    """MockTransport handler for every instance, answering per host"""
+
+    def __init__(self):
+        self.hosts = []
+        self.status = {}
+        self.down = set()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.hosts.append(request.url.host)
+        if request.url.host in self.down:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(self.status.get(request.url.host, 200), stream=Body())
+
+    def balanced(self, **kwargs) -> BalancedTransport:
+        return BalancedTransport(URLS, lambda: httpx.MockTransport(self), **kwargs)
+
+
+def send(transport: BalancedTransport, count: int = 1, **extensions):
+    """Send `count` GETs through the balancer, reading every response"""
+    async def run():
+        async with httpx.AsyncClient(transport=transport, base_url="http://expense") as client:
+            for _ in range(count):
+                try:
+                    await client.get("/api/expenses", extensions=extensions)
+                except httpx.ConnectError:
+                    pass
+
+    asyncio.run(run())
+
+
+def test_requests_go_to_the_least_outstanding_instance():
+    upstreams = Upstreams()
+    transport = upstreams.balanced()
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport, base_url="http://expense") as client:
+            # Two open streams keep their instances busy until they are closed
+            held = [await client.send(client.build_request("GET", "/export"), stream=True) for _ in range(2)]
+            assert sorted(inst.outstanding for inst in transport.instances) == [0, 1, 1]
+            idle = next(inst for inst in transport.instances if inst.outstanding == 0)
+            await client.get("/api/expenses")
+            for response in held:
+                await response.aclose()
+            return idle
+
+    idle = asyncio.run(run())
+
+    assert upstreams.hosts[-1] == idle.host
+    assert [inst.outstanding for inst in transport.instances] == [0, 0, 0]
+
+
+def test_instance_is_ejected_after_consecutive_failures_and_returns(clock, monkeypatch):
+    monkeypatch.setattr(balancer, "time", clock)
+    upstreams = Upstreams()
+    upstreams.status["expense-1"] = 503
+    transport = upstreams.balanced(eject_failures=2, eject_seconds=10)
+
+    send(transport, count=30)
+    failing = transport.instances[0]
+    assert failing.ejections == 1
+    assert failing.is_ejected(clock.now)
+
+    upstreams.hosts.clear()
+    send(transport, count=20)
+    assert "expense-1" not in upstreams.hosts
+
+    clock.advance(10)
+    upstreams.hosts.clear()
+    send(transport, count=20)
+    assert "expense-1" in upstreams.hosts
+
+
+def test_connection_errors_count_towards_ejection(clock, monkeypatch):
+    monkeypatch.setattr(balancer, "time", clock)
+    upstreams = Upstreams()
+    upstreams.down.add("expense-2")
+    transport = upstreams.balanced(eject_failures=3)
+
+    send(transport, count=30)
+
+    assert transport.instances[1].is_ejected(clock.now)
+    assert [inst.outstanding for inst in transport.instances] == [0, 0, 0]
+
+
+def test_all_instances_are_used_when_every_one_is_ejected(clock, monkeypatch):
+    monkeypatch.setattr(balancer, "time", clock)
+    upstreams = Upstreams()
+    upstreams.status.update({"expense-1": 500, "expense-2": 500, "expense-3": 500})
+    transport = upstreams.balanced(eject_failures=1)
+
+    send(transport, count=3)
+    assert all(inst.is_ejected(clock.now) for inst in transport.instances)
+
+    upstreams.hosts.clear()
+    send(transport, count=30)
+
+    assert set(upstreams.hosts) == {"expense-1", "expense-2", "expense-3"}
+
+
+def test_pinned_instance_bypasses_selection_and_ejection(clock, monkeypatch):
+    monkeypatch.setattr(balancer, "time", clock)
+    upstreams = Upstreams()
+    transport = upstreams.balanced()
+    pinned = transport.instances[2]
+    pinned.ejected_until = clock.now + 60
+
+    send(transport, count=5, **{PINNED_INSTANCE: pinned})
+
+    assert upstreams.hosts == ["expense-3"] * 5
@@ -0,0 +1,131 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from coalesce import SharedResponse, SingleFlight
+from proxy import UpstreamFailure, fetch
+
+KEY = ("GET", "/api/expenses", "user-1", None, None)
+
+
+class Body(httpx.AsyncByteStream):
+    """A raw upstream body, unread until the gateway streams it (like a real transport's)"""
+
+    def __init__(self, *chunks: bytes):
+        self.chunks = chunks
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def test_waiters_get_the_leaders_result():
+    async def run():
+        single_flight = SingleFlight()
+        flight = single_flight.lead(KEY)
+        waiters = [single_flight.join(KEY) for _ in range(3)]
+        shared = SharedResponse(200, {"content-type": "application/json"}, b"[]")
+        single_flight.finish(KEY, flight, result=shared)
+        return single_flight, shared, await asyncio.gather(*(waiter.wait() for waiter in waiters))
+
+    single_flight, shared, results = asyncio.run(run())
+
+    assert results == [shared] * 3
+    assert single_flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 3, "not_shareable": 0}
+
+
+def test_leader_error_fans_out_to_every_waiter():
+    async def run():
+        single_flight = SingleFlight()
+        flight = single_flight.lead(KEY)
+        waiters = [single_flight.join(KEY) for _ in range(3)]
+        error = HTTPException(status_code=503, detail="Expense service unavailable")
+        single_flight.finish(KEY, flight, error=error)
+        outcomes = await asyncio.gather(*(waiter.wait() for waiter in waiters), return_exceptions=True)
+        return single_flight, error, outcomes
+
+    single_flight, error, outcomes = asyncio.run(run())
+
+    assert outcomes == [error] * 3
+    # The failed flight is retired: the next request leads a fresh call
+    assert single_flight.join(KEY) is None
+
+
+def shared_call(handler, make_request, method: str = "GET", callers: int = 4):
+    """Run `callers` identical requests through proxy.fetch at once; returns their outcomes"""
+    async def run():
+        single_flight = SingleFlight()
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://upstream") as client:
+            outcomes = await asyncio.gather(*(
+                fetch(client, make_request(method, "/api/expenses"), "/api/expenses", None, "Expense service", None,
+                      single_flight, KEY)
+                for _ in range(callers)
+            ), return_exceptions=True)
+            for outcome in outcomes:
+                if isinstance(outcome, httpx.Response):
+                    await outcome.aclose()
+            return outcomes
+
+    return asyncio.run(run())
+
+
+def test_one_upstream_call_is_shared_by_concurrent_gets(make_request):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, headers={"content-length": "7"}, stream=Body(b"[1,2,3]"))
+
+    outcomes = shared_call(handler, make_request)
+
+    assert len(calls) == 1
+    assert all(isinstance(outcome, SharedResponse) and outcome.body == b"[1,2,3]" for outcome in outcomes)
+
+
+def test_upstream_failure_is_sampled_by_the_leader_only(make_request):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.01)
+        raise httpx.ConnectError("connection refused")
+
+    outcomes = shared_call(handler, make_request)
+
+    assert len(calls) == 1
+    assert sum(isinstance(outcome, UpstreamFailure) for outcome in outcomes) == 1
+    # Waiters get the same 503, but not as an UpstreamFailure the limiter would sample again
+    waiters = [outcome for outcome in outcomes if not isinstance(outcome, UpstreamFailure)]
+    assert len(waiters) == 3
+    assert all(type(outcome) is HTTPException and outcome.status_code == 503 for outcome in waiters)
+
+
+def test_unshareable_responses_make_waiters_call_for_themselves(make_request):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, stream=Body(b"chunk"))
+
+    outcomes = shared_call(handler, make_request)
+
+    assert len(calls) == 4
+    assert all(isinstance(outcome, httpx.Response) for outcome in outcomes)
+
+
+@pytest.mark.parametrize("method", ["POST", "PUT"])
+def test_writes_are_never_coalesced(make_request, method):
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.01)
+        return httpx.Response(201, json={})
+
+    shared_call(handler, make_request, method=method, callers=3)
+
+    assert len(calls) == 3
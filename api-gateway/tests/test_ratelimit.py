@@ -0,0 +1,83 @@
+import asyncio
+
+import ratelimit
+from ratelimit import Quota, RateLimiter
+
+IP = "203.0.113.7"
+
+
+class DownRedis:
+    """A Redis client whose connection is refused on every script call"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def register_script(self, source):
+        async def script(keys, args):
+            self.calls += 1
+            raise ConnectionError("Connection refused")
+        return script
+
+
+def limiter(redis=None) -> RateLimiter:
+    limiter = RateLimiter(redis, redis_retry_interval=5)
+    limiter.ip_quota = Quota(2, 60)
+    limiter.user_quota = Quota(3, 60)
+    limiter.group_quotas = {"auth": Quota(1, 60)}
+    return limiter
+
+
+def outcomes(limiter: RateLimiter, count: int, **kwargs) -> list:
+    async def run():
+        return [await limiter.check(IP, **kwargs) for _ in range(count)]
+
+    return asyncio.run(run())
+
+
+def test_local_buckets_take_over_while_redis_is_down(clock, monkeypatch):
+    monkeypatch.setattr(ratelimit, "time", clock)
+    redis = DownRedis()
+    rate_limiter = limiter(redis)
+
+    results = outcomes(rate_limiter, 3)
+
+    assert [result.allowed for result in results] == [True, True, False]
+    assert results[-1].headers()["Retry-After"] == "30"
+    # Redis is skipped until the retry interval passes, then tried again
+    assert redis.calls == 1
+    assert rate_limiter.redis_down_until == clock.now + 5
+    clock.advance(5)
+    outcomes(rate_limiter, 1)
+    assert redis.calls == 2
+
+
+def test_local_buckets_refill_over_the_window(clock, monkeypatch):
+    monkeypatch.setattr(ratelimit, "time", clock)
+    rate_limiter = limiter()
+
+    assert [result.allowed for result in outcomes(rate_limiter, 3)] == [True, True, False]
+    clock.advance(30)
+    assert [result.allowed for result in outcomes(rate_limiter, 2)] == [True, False]
+
+
+def test_every_bucket_must_have_a_token(clock, monkeypatch):
+    monkeypatch.setattr(ratelimit, "time", clock)
+    rate_limiter = limiter(DownRedis())
+
+    results = outcomes(rate_limiter, 2, group="auth", user_id="alice")
+
+    assert [result.allowed for result in results] == [True, False]
+    assert (results[0].limit, results[0].remaining) == (1, 0)
+    # The refused request charged nothing, so the IP bucket still has a token left
+    assert outcomes(rate_limiter, 1)[0].allowed
+
+
+def test_ip_bucket_charged_earlier_is_skipped(clock, monkeypatch):
+    monkeypatch.setattr(ratelimit, "time", clock)
+    rate_limiter = limiter(DownRedis())
+    assert all(result.allowed for result in outcomes(rate_limiter, 2))
+
+    results = outcomes(rate_limiter, 3, user_id="alice", ip=False)
+
+    assert [result.allowed for result in results] == [True, True, True]
+    assert not outcomes(rate_limiter, 1)[0].allowed
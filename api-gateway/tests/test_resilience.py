@@ -0,0 +1,204 @@
+import asyncio
+
+import httpx
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, RetryBudget, UpstreamPolicy, _discard
+
+
+class RecordingStream(httpx.AsyncByteStream):
+    def __init__(self):
+        self.closed = False
+
+    async def __aiter__(self):
+        yield b"{}"
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_breaker_opens_after_consecutive_failures(clock, monkeypatch):
+    monkeypatch.setattr(resilience, "time", clock)
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=10)
+
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() == 10
+
+
+def test_half_open_admits_one_probe_and_closes_on_success(clock, monkeypatch):
+    monkeypatch.setattr(resilience, "time", clock)
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10)
+    breaker.record_failure()
+
+    clock.advance(9.9)
+    assert not breaker.allow()
+    clock.advance(0.2)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one probe at a time while half-open
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_half_open_failure_reopens_for_a_full_timeout(clock, monkeypatch):
+    monkeypatch.setattr(resilience, "time", clock)
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10)
+    breaker.record_failure()
+    clock.advance(10)
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opens == 2
+    clock.advance(9)
+    assert not breaker.allow()
+
+
+def test_released_half_open_probe_frees_the_slot(clock, monkeypatch):
+    monkeypatch.setattr(resilience, "time", clock)
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10)
+    breaker.record_failure()
+    clock.advance(10)
+    assert breaker.allow()
+
+    breaker.release()
+
+    assert breaker.allow()
+
+
+def test_retry_budget_is_a_fraction_of_recent_requests(clock, monkeypatch):
+    monkeypatch.setattr(resilience, "time", clock)
+    budget = RetryBudget(ratio=0.5, min_per_second=0.1, window=10)
+    for _ in range(4):
+        budget.record_request()
+
+    # 0.1/s * 10s + 0.5 * 4 requests = 3 retries
+    for _ in range(3):
+        assert budget.can_retry()
+        budget.record_retry()
+    assert not budget.can_retry()
+    assert budget.exhausted == 1
+
+    # Old retries leave the window
+    clock.advance(10.1)
+    assert budget.can_retry()
+
+
+def test_policy_stops_retrying_when_the_budget_is_exhausted():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(503)
+
+    async def run():
+        policy = UpstreamPolicy("test_budget", max_retries=3)
+        policy.retry_backoff = 0
+        policy.budget = RetryBudget(ratio=0, min_per_second=0.1, window=10)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://upstream") as client:
+            first = await policy.send(client, client.build_request("GET", "/"), stream=False)
+            second = await policy.send(client, client.build_request("GET", "/"), stream=False)
+        return policy, first, second
+
+    policy, first, second = asyncio.run(run())
+
+    assert first.status_code == second.status_code == 503
+    # One retry fits the budget (0.1/s over 10s), the rest are refused
+    assert len(calls) == 3
+    assert policy.retries == 1
+    assert policy.budget.exhausted >= 1
+
+
+def test_open_breaker_short_circuits_without_calling_the_upstream():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500)
+
+    async def run():
+        policy = UpstreamPolicy("test_open", max_retries=0)
+        policy.breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://upstream") as client:
+            for _ in range(2):
+                await policy.send(client, client.build_request("POST", "/"), stream=False)
+            with pytest.raises(CircuitOpenError):
+                await policy.send(client, client.build_request("POST", "/"), stream=False)
+        return policy
+
+    policy = asyncio.run(run())
+
+    assert len(calls) == 2
+    assert policy.short_circuited == 1
+
+
+def test_hedge_wins_and_the_primary_is_cancelled():
+    attempts = []
+    cancelled = []
+
+    async def handler(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(request)
+                raise
+        return httpx.Response(200, json={"attempt": len(attempts)})
+
+    async def on_request(request):
+        request.extensions["gateway_start"] = id(request)
+
+    async def run():
+        policy = UpstreamPolicy("test_hedge", hedge=True)
+        policy.latency.samples.extend([0.01] * policy.latency.min_samples)
+        client = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler), base_url="http://upstream", event_hooks={"request": [on_request]}
+        )
+        async with client:
+            request = client.build_request("GET", "/", headers={"x-trace": "1"})
+            response = await policy.send(client, request, stream=False)
+        return policy, request, response
+
+    policy, request, response = asyncio.run(run())
+
+    assert response.json() == {"attempt": 2}
+    assert (policy.hedges, policy.hedge_wins) == (1, 1)
+    assert cancelled == [attempts[0]]
+    # The hedge is a request of its own, so the hooks did not overwrite the primary's state
+    assert attempts[1] is not request
+    assert attempts[1].headers["x-trace"] == "1"
+    assert request.extensions["gateway_start"] == id(request)
+
+
+def test_discard_cancels_pending_attempts_and_closes_finished_ones():
+    async def run():
+        stream = RecordingStream()
+
+        async def finished():
+            return httpx.Response(200, stream=stream)
+
+        done = asyncio.ensure_future(finished())
+        pending = asyncio.ensure_future(asyncio.sleep(5))
+        await asyncio.sleep(0)
+        await _discard({done, pending})
+        return stream, pending
+
+    stream, pending = asyncio.run(run())
+
+    assert stream.closed
+    assert pending.cancelled()
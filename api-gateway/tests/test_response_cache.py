@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+import response_cache
+from coalesce import SharedResponse
+from response_cache import ResponseCache
+
+URL = "/api/expenses?page=1"
+
+
+class FakeRedis:
+    """The two Redis calls the cache makes, kept in a dict"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+
+def response(cache_control: str, status_code: int = 200, **headers) -> SharedResponse:
+    return SharedResponse(status_code, {"cache-control": cache_control, "content-type": "application/json", **headers}, b"[]")
+
+
+def test_private_entries_are_scoped_to_their_user():
+    async def run():
+        cache = ResponseCache(enabled=True)
+        await cache.store(URL, "alice", {}, response("private, max-age=60"))
+        return await cache.lookup(URL, "alice", {}), await cache.lookup(URL, "bob", {})
+
+    alice, bob = asyncio.run(run())
+
+    assert alice is not None and not alice.shared
+    assert bob is None
+
+
+@pytest.mark.parametrize("cache_control", ["public, max-age=60", "s-maxage=60"])
+def test_public_entries_are_shared_between_users(cache_control):
+    async def run():
+        cache = ResponseCache(enabled=True)
+        await cache.store(URL, "alice", {}, response(cache_control))
+        return await cache.lookup(URL, "bob", {})
+
+    entry = asyncio.run(run())
+
+    assert entry is not None and entry.shared
+
+
+def test_vary_selects_the_variant_by_request_header():
+    async def run():
+        cache = ResponseCache(enabled=True)
+        await cache.store(URL, "alice", {"accept-language": "en"}, response("max-age=60", vary="Accept-Language"))
+        return (
+            await cache.lookup(URL, "alice", {"accept-language": "en"}),
+            await cache.lookup(URL, "alice", {"accept-language": "fr"}),
+            await cache.lookup(URL, "alice", {}),
+        )
+
+    english, french, unspecified = asyncio.run(run())
+
+    assert english is not None and english.vary == {"accept-language": "en"}
+    assert french is None
+    assert unspecified is None
+
+
+@pytest.mark.parametrize("shared", [
+    response("no-cache"),
+    response("no-store, max-age=60"),
+    response("max-age=60", vary="*"),
+    response("max-age=60", status_code=404),
+])
+def test_uncacheable_responses_are_not_stored(shared):
+    async def run():
+        cache = ResponseCache(enabled=True)
+        return await cache.store(URL, "alice", {}, shared), await cache.lookup(URL, "alice", {})
+
+    stored, found = asyncio.run(run())
+
+    assert stored is None and found is None
+
+
+def test_expired_entries_without_an_etag_are_dropped(clock, monkeypatch):
+    monkeypatch.setattr(response_cache, "time", clock)
+
+    async def run():
+        cache = ResponseCache(enabled=True)
+        await cache.store(URL, "alice", {}, response("max-age=60, stale-while-revalidate=30"))
+        clock.advance(61)
+        stale = await cache.lookup(URL, "alice", {})
+        clock.advance(30)
+        return stale, await cache.lookup(URL, "alice", {})
+
+    stale, expired = asyncio.run(run())
+
+    assert stale is not None and not stale.is_fresh()
+    assert expired is None
+
+
+def test_redis_keeps_the_user_scope_across_gateway_instances():
+    async def run():
+        redis = FakeRedis()
+        await ResponseCache(redis, enabled=True).store(
+            URL, "alice", {"accept-language": "en"}, response("max-age=60", vary="Accept-Language")
+        )
+        other_instance = ResponseCache(redis, enabled=True)
+        return (
+            await other_instance.lookup(URL, "alice", {"accept-language": "en"}),
+            await other_instance.lookup(URL, "alice", {"accept-language": "fr"}),
+            await other_instance.lookup(URL, "bob", {"accept-language": "en"}),
+        )
+
+    alice, other_variant, bob = asyncio.run(run())
+
+    assert alice is not None and alice.body == b"[]"
+    assert other_variant is None
+    assert bob is None
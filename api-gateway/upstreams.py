@@ -0,0 +1,149 @@
+import httpx
+import os
+from typing import Callable, Dict, Optional
+
+from balancer import BalancedTransport, balancer_of, parse_instances, transport_pools
+
+
+# Request extension marking the gateway's own calls (health probes, schema fetches);
+# the upstream event hooks leave them out of latency metrics and concurrency samples
+UNMETERED = "gateway_unmetered"
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+class UpstreamConfig:
+    """Connection settings for one upstream service.
+
+    Every setting can be overridden per upstream with an env var prefixed by the
+    upstream name, e.g. EXPENSE_POOL_MAX_CONNECTIONS or ANALYTICS_READ_TIMEOUT.
+    `base_url` may list several instances separated by commas; requests are then
+    balanced across them, and the pool limits apply to each instance.
+    """
+
+    def __init__(self, name: str, base_url: str):
+        prefix = name.upper()
+        self.name = name
+        self.instances = parse_instances(base_url)
+        self.base_url = self.instances[0]
+        self.max_connections = _env_int(f"{prefix}_POOL_MAX_CONNECTIONS", _env_int("UPSTREAM_POOL_MAX_CONNECTIONS", 100))
+        self.max_keepalive = _env_int(f"{prefix}_POOL_MAX_KEEPALIVE", _env_int("UPSTREAM_POOL_MAX_KEEPALIVE", 20))
+        self.keepalive_expiry = _env_float(f"{prefix}_POOL_KEEPALIVE_EXPIRY", _env_float("UPSTREAM_POOL_KEEPALIVE_EXPIRY", 30.0))
+        self.connect_timeout = _env_float(f"{prefix}_CONNECT_TIMEOUT", _env_float("UPSTREAM_CONNECT_TIMEOUT", 2.0))
+        self.read_timeout = _env_float(f"{prefix}_READ_TIMEOUT", _env_float("UPSTREAM_READ_TIMEOUT", 10.0))
+        self.pool_timeout = _env_float(f"{prefix}_POOL_TIMEOUT", _env_float("UPSTREAM_POOL_TIMEOUT", 5.0))
+        self.http2 = _env_bool(f"{prefix}_HTTP2", _env_bool("UPSTREAM_HTTP2", False))
+        self.eject_failures = _env_int(f"{prefix}_EJECT_FAILURES", _env_int("UPSTREAM_EJECT_FAILURES", 3))
+        self.eject_seconds = _env_float(f"{prefix}_EJECT_SECONDS", _env_float("UPSTREAM_EJECT_SECONDS", 10.0))
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def build_transport(self) -> httpx.AsyncHTTPTransport:
+        return httpx.AsyncHTTPTransport(http2=self.http2, limits=self.limits())
+
+    def build_client(self, event_hooks: Optional[dict] = None) -> httpx.AsyncClient:
+        """Create the pooled client for this upstream (balanced when it has several instances)"""
+        transport = None
+        if len(self.instances) > 1:
+            transport = BalancedTransport(
+                self.instances,
+                self.build_transport,
+                eject_failures=self.eject_failures,
+                eject_seconds=self.eject_seconds,
+            )
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            event_hooks=event_hooks,
+            http2=self.http2,
+            limits=self.limits(),
+            transport=transport,
+            timeout=httpx.Timeout(
+                self.read_timeout,
+                connect=self.connect_timeout,
+                pool=self.pool_timeout,
+            ),
+        )
+
+
+class UpstreamRegistry:
+    """One long-lived, keep-alive AsyncClient per upstream service"""
+
+    def __init__(self, event_hooks: Optional[Callable[[str], dict]] = None):
+        self.configs: Dict[str, UpstreamConfig] = {}
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        # Builds httpx event hooks for an upstream name (used for instrumentation)
+        self.event_hooks = event_hooks
+
+    def hooks_for(self, name: str) -> Optional[dict]:
+        return self.event_hooks(name) if self.event_hooks else None
+
+    def register(self, name: str, base_url: str) -> UpstreamConfig:
+        config = UpstreamConfig(name, base_url)
+        self.configs[name] = config
+        return config
+
+    async def start(self):
+        """Open a client for every registered upstream (called from the app lifespan)"""
+        for name, config in self.configs.items():
+            if name not in self.clients:
+                self.clients[name] = config.build_client(self.hooks_for(name))
+
+    async def close(self):
+        """Close all clients and their pooled connections"""
+        for client in self.clients.values():
+            await client.aclose()
+        self.clients.clear()
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self.clients.get(name)
+        if client is None:
+            # Used outside the lifespan (e.g. scripts); create lazily
+            client = self.configs[name].build_client(self.hooks_for(name))
+            self.clients[name] = client
+        return client
+
+    def url(self, name: str) -> str:
+        return self.configs[name].base_url
+
+    def pool_stats(self, name: str) -> Optional[dict]:
+        """Snapshot of the connection pool of one upstream"""
+        client = self.clients.get(name)
+        if client is None:
+            return None
+        pools = transport_pools(client)
+        connections = [conn for pool in pools for conn in getattr(pool, "connections", [])]
+        requests = [req for pool in pools for req in getattr(pool, "_requests", [])]
+        idle = sum(1 for conn in connections if conn.is_idle())
+        waiting = sum(1 for req in requests if req.is_queued())
+        config = self.configs[name]
+        stats = {
+            "connections": len(connections),
+            "in_use": len(connections) - idle,
+            "idle": idle,
+            "waiting": waiting,
+            "max_connections": config.max_connections,
+            "max_keepalive": config.max_keepalive,
+            "http2": config.http2,
+        }
+        balancer = balancer_of(client)
+        if balancer is not None:
+            stats["instances"] = balancer.stats()
+        return stats
+
+    def stats(self) -> dict:
+        return {name: self.pool_stats(name) for name in self.configs}
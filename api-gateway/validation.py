@@ -0,0 +1,188 @@
+import asyncio
+import json
+import logging
+import re
+from datetime import date, datetime
+from typing import AsyncIterator, Dict, List, Optional, Type
+
+from fastapi import Request, HTTPException
+from pydantic import BaseModel, Field, ValidationError, create_model
+
+import schemas
+from upstreams import UNMETERED
+
+logger = logging.getLogger(__name__)
+
+# JSON Schema scalar types the upstream request bodies use
+JSON_SCHEMA_TYPES = {"integer": int, "number": float, "boolean": bool, "string": str}
+STRING_FORMATS = {"date-time": datetime, "date": date}
+# JSON Schema keyword -> pydantic Field constraint
+CONSTRAINTS = {
+    "exclusiveMinimum": "gt",
+    "minimum": "ge",
+    "exclusiveMaximum": "lt",
+    "maximum": "le",
+    "minLength": "min_length",
+    "maxLength": "max_length",
+    "pattern": "pattern",
+}
+
+
+class EdgeRoute:
+    """A write route with its own body cap, whose JSON body is validated when it has a schema"""
+
+    def __init__(self, method: str, path: str, upstream: str, schema: Optional[str], max_body_bytes: int):
+        self.method = method
+        self.path = re.compile(path)
+        self.upstream = upstream
+        self.schema = schema
+        self.max_body_bytes = max_body_bytes
+
+    def matches(self, method: str, path: str) -> bool:
+        return method == self.method and self.path.match(path) is not None
+
+
+def field_type(schema: dict):
+    """Python type and Field constraints for one JSON Schema property"""
+    branches = schema.get("anyOf", [schema])
+    nullable = any(branch.get("type") == "null" for branch in branches)
+    branch = next((branch for branch in branches if branch.get("type") != "null"), {})
+    python_type = STRING_FORMATS.get(branch.get("format")) if branch.get("type") == "string" else None
+    python_type = python_type or JSON_SCHEMA_TYPES.get(branch.get("type"), object)
+    constraints = {CONSTRAINTS[key]: value for key, value in branch.items() if key in CONSTRAINTS}
+    return (Optional[python_type] if nullable else python_type), constraints
+
+
+def model_from_schema(name: str, schema: dict) -> Type[BaseModel]:
+    """Build a pydantic model from an OpenAPI component schema of flat scalar fields"""
+    required = set(schema.get("required", []))
+    fields = {}
+    for field_name, prop in schema.get("properties", {}).items():
+        python_type, constraints = field_type(prop)
+        default = ... if field_name in required else prop.get("default")
+        fields[field_name] = (python_type, Field(default, **constraints))
+    return create_model(name, **fields)
+
+
+class EdgeValidator:
+    """Reject oversized or invalid request bodies before any upstream work.
+
+    Every proxied write is capped at a per-upstream body size (or the tighter cap
+    of its route), checked against Content-Length up front and counted again
+    while the body streams in. Routes with a schema are read (within the cap) and
+    validated, answering 422 the way the upstream would. Schemas start as the
+    mirrored models in schemas.py and are replaced by the upstream's own OpenAPI
+    component schemas once they can be fetched.
+    """
+
+    def __init__(self, routes: List[EdgeRoute], body_limits: Dict[str, int], default_limit: int,
+                 retry_interval: float = 10.0):
+        self.routes = routes
+        self.body_limits = body_limits
+        self.default_limit = default_limit
+        self.retry_interval = retry_interval
+        self.models: Dict[str, Type[BaseModel]] = {
+            route.schema: getattr(schemas, route.schema) for route in routes if route.schema is not None
+        }
+        self.sources: Dict[str, str] = {schema: "mirror" for schema in self.models}
+        self.task: Optional[asyncio.Task] = None
+        self.rejected_size = 0
+        self.rejected_invalid = 0
+
+    def start(self, upstreams):
+        if self.task is None:
+            self.task = asyncio.create_task(self.load_loop(upstreams))
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def load_loop(self, upstreams):
+        pending = {route.upstream for route in self.routes if route.schema is not None}
+        while pending:
+            for name in list(pending):
+                if await self.load(name, upstreams.get(name)):
+                    pending.discard(name)
+            if pending:
+                await asyncio.sleep(self.retry_interval)
+
+    async def load(self, name: str, client) -> bool:
+        """Replace the mirrored models of one upstream with its OpenAPI schemas"""
+        try:
+            response = await client.get("/openapi.json", timeout=2.0, extensions={UNMETERED: True})
+            response.raise_for_status()
+            components = response.json().get("components", {}).get("schemas", {})
+        except Exception as e:
+            logger.warning(f"Could not load OpenAPI schemas from {name}, using mirrored schemas: {e}")
+            return False
+        for route in self.routes:
+            if route.upstream == name and route.schema in components:
+                self.models[route.schema] = model_from_schema(route.schema, components[route.schema])
+                self.sources[route.schema] = "openapi"
+        return True
+
+    def route_for(self, method: str, path: str) -> Optional[EdgeRoute]:
+        return next((route for route in self.routes if route.matches(method, path)), None)
+
+    async def check(self, request: Request, upstream: str):
+        """Enforce the body cap of a proxied request and validate its body if the route has a schema"""
+        if request.method in ("GET", "HEAD", "OPTIONS"):
+            return
+        route = self.route_for(request.method, request.url.path)
+        limit = route.max_body_bytes if route is not None else self.body_limits.get(upstream, self.default_limit)
+        content_length = request.headers.get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            self.too_large(limit)
+        # Enforced by send_upstream for bodies that stream straight through
+        request.state.max_body_bytes = limit
+        if route is None or route.schema is None:
+            return
+
+        body = await self.read_body(request, limit)
+        try:
+            self.models[route.schema].model_validate_json(body or b"null")
+        except ValidationError as e:
+            self.rejected_invalid += 1
+            raise HTTPException(status_code=422, detail=json.loads(e.json(include_url=False)))
+
+    async def read_body(self, request: Request, limit: int) -> bytes:
+        """Read the whole body, stopping as soon as it grows past `limit` bytes"""
+        if not hasattr(request, "_body"):
+            chunks = []
+            size = 0
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > limit:
+                    self.too_large(limit)
+                chunks.append(chunk)
+            # Cache it like Request.body() so the proxy forwards the same bytes
+            request._body = b"".join(chunks)
+        elif len(request._body) > limit:
+            self.too_large(limit)
+        return request._body
+
+    def too_large(self, limit: int):
+        self.rejected_size += 1
+        raise HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+
+    def stats(self) -> dict:
+        return {
+            "schemas": dict(self.sources),
+            "rejected_size": self.rejected_size,
+            "rejected_invalid": self.rejected_invalid,
+        }
+
+
+async def limited_stream(request: Request, limit: int) -> AsyncIterator[bytes]:
+    """Stream the body through, aborting with 413 once it grows past `limit` bytes"""
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+        yield chunk
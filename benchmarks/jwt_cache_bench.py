@@ -0,0 +1,59 @@
+"""Micro-benchmark: gateway JWT verification with and without the verified-token cache.
+
+Run from the repository root:
+    python benchmarks/jwt_cache_bench.py
+"""
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api-gateway"))
+
+from jose import jwt
+from jwt_cache import VerifiedTokenCache
+
+SECRET = "benchmark-secret"
+ALGORITHM = "HS256"
+ITERATIONS = 50_000
+DISTINCT_TOKENS = 100
+
+
+def make_tokens(count: int):
+    exp = int(time.time()) + 3600
+    return [
+        jwt.encode({"user_id": str(uuid.uuid4()), "jti": uuid.uuid4().hex, "exp": exp}, SECRET, algorithm=ALGORITHM)
+        for _ in range(count)
+    ]
+
+
+def verify_uncached(token: str) -> dict:
+    return jwt.decode(token, SECRET, algorithms=[ALGORITHM])
+
+
+def verify_cached(cache: VerifiedTokenCache, token: str) -> dict:
+    payload = cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, SECRET, algorithms=[ALGORITHM])
+        cache.put(token, payload)
+    return payload
+
+
+def run(label: str, fn, tokens):
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        fn(tokens[i % len(tokens)])
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {ITERATIONS / elapsed:>12,.0f} verifications/s  ({elapsed * 1e6 / ITERATIONS:.2f} us each)")
+    return elapsed
+
+
+if __name__ == "__main__":
+    tokens = make_tokens(DISTINCT_TOKENS)
+    cache = VerifiedTokenCache(max_size=10_000)
+
+    print(f"{ITERATIONS} verifications over {DISTINCT_TOKENS} distinct tokens")
+    uncached = run("uncached", verify_uncached, tokens)
+    cached = run("cached", lambda token: verify_cached(cache, token), tokens)
+    print(f"speedup      {uncached / cached:.1f}x")
+    print(f"cache stats  {cache.stats()}")
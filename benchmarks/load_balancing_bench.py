@@ -0,0 +1,94 @@
+"""Benchmark: least-outstanding-requests balancing across local stub instances.
+
+Starts three stub upstream instances in-process, drives concurrent requests
+through the gateway's balanced client and prints how the load was spread, then
+makes one instance fail to show passive ejection.
+
+Run from the repository root:
+    python benchmarks/load_balancing_bench.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api-gateway"))
+
+import uvicorn
+
+from upstreams import UpstreamConfig
+
+PORTS = (18101, 18102, 18103)
+# Simulated service time per request
+LATENCY = 0.005
+REQUESTS = 3000
+CONCURRENCY = 64
+failing = set()
+
+
+def stub_app(port: int):
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        await asyncio.sleep(LATENCY)
+        status = 503 if port in failing else 200
+        body = b'{"ok": true}'
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+async def start_stubs():
+    servers = []
+    for port in PORTS:
+        server = uvicorn.Server(uvicorn.Config(stub_app(port), host="127.0.0.1", port=port, log_level="error", lifespan="off"))
+        servers.append(server)
+        asyncio.create_task(server.serve())
+    while not all(server.started for server in servers):
+        await asyncio.sleep(0.01)
+    return servers
+
+
+async def drive(client, count: int):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one():
+        async with semaphore:
+            await client.get("/health")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(count)))
+    return time.perf_counter() - start
+
+
+def report(label: str, balancer, elapsed: float, count: int):
+    print(f"\n{label}: {count} requests, concurrency {CONCURRENCY}, {count / elapsed:,.0f} req/s")
+    for url, stats in balancer.stats().items():
+        share = stats["requests"] / count * 100
+        print(f"  {url:<26} {stats['requests']:>6} requests ({share:5.1f}%)  failures {stats['failures']:>4}  ejected {stats['ejected']}")
+
+
+async def main():
+    servers = await start_stubs()
+    config = UpstreamConfig("bench", ",".join(f"http://127.0.0.1:{port}" for port in PORTS))
+    client = config.build_client()
+    balancer = client._transport
+    try:
+        elapsed = await drive(client, REQUESTS)
+        report("least outstanding", balancer, elapsed, REQUESTS)
+
+        for instance in balancer.instances:
+            instance.requests = instance.failures = 0
+        failing.add(PORTS[0])
+        elapsed = await drive(client, REQUESTS)
+        report(f"passive ejection (:{PORTS[0]} returns 503)", balancer, elapsed, REQUESTS)
+    finally:
+        await client.aclose()
+        for server in servers:
+            server.should_exit = True
+        await asyncio.sleep(0.2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
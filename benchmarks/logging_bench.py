@@ -0,0 +1,102 @@
+"""Per-request logging overhead: print() versus the queued JSON logger (jsonlog.py).
+
+Each simulated request emits the lines a proxied write produces today (one
+per-request line, one event-published line and one consumer line), either with
+print() or with logger calls going through the shared jsonlog queue. Both are
+timed against a fast sink (/dev/null) and a slow one that takes
+SLOW_WRITE_US microseconds per write, as a blocked pipe or busy log
+collector would. Requests are spaced REQUEST_GAP_US apart; only the logging
+calls themselves are timed.
+
+Run from the repository root:
+    python benchmarks/logging_bench.py [requests]
+"""
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api-gateway"))
+
+from jsonlog import JsonLogging  # noqa: E402
+
+SLOW_WRITE_US = 200
+# Idle time between requests (the rest of the request's work, ~4000 requests/s)
+REQUEST_GAP_US = 250
+
+
+class SlowSink(io.TextIOBase):
+    """A stdout whose line writes block for a fixed time"""
+
+    def write(self, text):
+        if "\n" not in text:
+            return len(text)
+        deadline = time.perf_counter() + SLOW_WRITE_US / 1e6
+        while time.perf_counter() < deadline:
+            pass
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def request_with_prints(i):
+    print(f"POST /api/expenses user=user-{i} email=user{i}@example.com")
+    print("✅ Published event to 'expense_events' queue: expense.created")
+    print("Received event: expense.created")
+
+
+def request_with_logger(logger, i):
+    logger.info(f"POST /api/expenses user=user-{i} email=user{i}@example.com")
+    logger.info("Published event to 'expense_events' queue", extra={"event_type": "expense.created", "sampled": True})
+    logger.info("Received event", extra={"event_type": "expense.created", "sampled": True})
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(label, sink, requests, use_logger):
+    real_stdout = sys.stdout
+    sys.stdout = sink
+    setup = None
+    logger = logging.getLogger("bench")
+    if use_logger:
+        setup = JsonLogging()
+        setup.configure("logging-bench")
+    timings = []
+    try:
+        for i in range(requests):
+            start = time.perf_counter()
+            if use_logger:
+                request_with_logger(logger, i)
+            else:
+                request_with_prints(i)
+            timings.append((time.perf_counter() - start) * 1e6)
+            time.sleep(REQUEST_GAP_US / 1e6)
+    finally:
+        drain_start = time.perf_counter()
+        if setup is not None:
+            stats = setup.stats()
+            setup.shutdown()
+        drain = time.perf_counter() - drain_start
+        sys.stdout = real_stdout
+    extra = f" dropped={stats['dropped']} writer_drain={drain:.2f}s" if setup is not None else ""
+    print(f"{label:<30} mean={sum(timings) / len(timings):8.2f}us p50={percentile(timings, 0.5):8.2f}us "
+          f"p99={percentile(timings, 0.99):8.2f}us{extra}")
+
+
+def main(requests):
+    os.environ.setdefault("LOG_SAMPLE_RATE", "0.1")
+    print(f"{requests} requests, 3 log lines each (slow sink: {SLOW_WRITE_US}us per write)\n")
+    with open(os.devnull, "w") as devnull:
+        run("print, fast stdout", devnull, requests, use_logger=False)
+        run("queued JSON, fast stdout", devnull, requests, use_logger=True)
+    run("print, slow stdout", SlowSink(), requests, use_logger=False)
+    run("queued JSON, slow stdout", SlowSink(), requests, use_logger=True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,71 @@
+"""Offline report over exported traces (TRACE_EXPORT_FILE of each service).
+
+Prints the mean and tail duration per span name, and the create-to-analytics
+visibility latency: from the gateway receiving POST /api/expenses to the
+analytics consumer finishing the matching expense.created message.
+
+Run from the repository root:
+    python benchmarks/trace_report.py traces/*.jsonl
+"""
+import json
+import sys
+from collections import defaultdict
+
+
+def load_spans(paths):
+    spans = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                for resource in json.loads(line)["resourceSpans"]:
+                    service = next(
+                        (attr["value"]["stringValue"] for attr in resource["resource"]["attributes"] if attr["key"] == "service.name"),
+                        "unknown",
+                    )
+                    for scope in resource["scopeSpans"]:
+                        for span in scope["spans"]:
+                            span["service"] = service
+                            span["start"] = int(span["startTimeUnixNano"])
+                            span["end"] = int(span["endTimeUnixNano"])
+                            spans.append(span)
+    return spans
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(label, values_ms):
+    if not values_ms:
+        return
+    print(f"{label:<58} n={len(values_ms):<6} mean={sum(values_ms) / len(values_ms):8.2f}ms "
+          f"p50={percentile(values_ms, 0.5):8.2f}ms p95={percentile(values_ms, 0.95):8.2f}ms max={max(values_ms):8.2f}ms")
+
+
+def main(paths):
+    spans = load_spans(paths)
+    by_name = defaultdict(list)
+    by_trace = defaultdict(list)
+    for span in spans:
+        by_name[f"{span['service']}: {span['name']}"].append((span["end"] - span["start"]) / 1e6)
+        by_trace[span["traceId"]].append(span)
+
+    print(f"{len(spans)} spans in {len(by_trace)} traces\n")
+    for name in sorted(by_name):
+        report(name, by_name[name])
+
+    visibility = []
+    for trace in by_trace.values():
+        created = [s for s in trace if s["service"] == "api-gateway" and s["name"] == "POST /api/expenses"]
+        consumed = [s for s in trace if s["service"] == "analytics-service" and s["name"] == "consume expense_events"]
+        if created and consumed:
+            visibility.append((max(s["end"] for s in consumed) - created[0]["start"]) / 1e6)
+    print()
+    report("create-to-analytics visibility", visibility)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    main(sys.argv[1:])
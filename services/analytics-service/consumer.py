@@ -1,21 +1,34 @@
 import pika
 import json
+import logging
 import os
 import threading
 from sqlalchemy.orm import Session
 from database import SessionLocal
 from models import ExpenseCache
+from tracing import extract, span
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 
 def process_expense_event(ch, method, properties, body):
     """Process expense events from RabbitMQ"""
+    with span("consume expense_events", "consumer", parent=extract(properties.headers), attributes={
+        "messaging.system": "rabbitmq",
+        "messaging.destination": "expense_events",
+    }) as consume_span:
+        handle_expense_event(ch, method, body, consume_span)
+
+
+def handle_expense_event(ch, method, body, consume_span):
     try:
         message = json.loads(body)
         event_type = message.get('event_type')
         data = message.get('data')
+        consume_span.set_attribute("event.type", event_type)
         
-        print(f"Received event: {event_type}")
+        logger.info("Received event", extra={"event_type": event_type, "sampled": True})
         
         db = SessionLocal()
         
@@ -29,7 +42,22 @@ def process_expense_event(ch, method, properties, body):
             )
             db.add(expense_cache)
             db.commit()
-            print(f"Cached expense {data['expense_id']}")
+            logger.info("Cached expense", extra={"expense_id": data['expense_id'], "sampled": True})
+        
+        elif event_type == 'expense.imported':
+            # One event per imported batch, each expense a row of data['fields']
+            db.add_all([
+                ExpenseCache(
+                    user_id=data['user_id'],
+                    expense_id=expense['expense_id'],
+                    amount=expense['amount'],
+                    category_id=expense['category_id'],
+                    date=datetime.fromisoformat(expense['date'])
+                )
+                for expense in (dict(zip(data['fields'], row)) for row in data['expenses'])
+            ])
+            db.commit()
+            logger.info("Cached imported expenses", extra={"count": len(data['expenses']), "sampled": True})
         
         elif event_type == 'expense.updated':
             # Update cached expense
@@ -40,7 +68,7 @@ def process_expense_event(ch, method, properties, body):
                 cached.amount = data['amount']
                 cached.category_id = data['category_id']
                 db.commit()
-                print(f"Updated cached expense {data['expense_id']}")
+                logger.info("Updated cached expense", extra={"expense_id": data['expense_id'], "sampled": True})
         
         elif event_type == 'expense.deleted':
             # Remove from cache
@@ -50,13 +78,14 @@ def process_expense_event(ch, method, properties, body):
             if cached:
                 db.delete(cached)
                 db.commit()
-                print(f"Removed cached expense {data['expense_id']}")
+                logger.info("Removed cached expense", extra={"expense_id": data['expense_id'], "sampled": True})
         
         db.close()
         ch.basic_ack(delivery_tag=method.delivery_tag)
         
     except Exception as e:
-        print(f"❌ Error processing event: {e}")
+        logger.error(f"Error processing event: {e}", exc_info=True)
+        consume_span.record_error(e)
         ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
 
 
@@ -83,11 +112,11 @@ def start_consumer():
             on_message_callback=process_expense_event
         )
         
-        print("Analytics Service consumer started, waiting for messages...")
+        logger.info("Analytics Service consumer started, waiting for messages...")
         channel.start_consuming()
         
     except Exception as e:
-        print(f"Consumer error: {e}")
+        logger.error(f"Consumer error: {e}", exc_info=True)
 
 
 def init_consumer():
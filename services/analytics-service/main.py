@@ -1,7 +1,7 @@
 from fastapi import FastAPI, Depends, HTTPException, Header
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timedelta
 import pandas as pd
 import httpx
@@ -14,6 +14,9 @@ from schemas import (
     CategoryBreakdown, BudgetStatus, SpendingTrends, TrendData
 )
 from consumer import init_consumer
+from tracing import TracingMiddleware, log_context, tracer
+from jsonlog import configure_logging
+from identity import IDENTITY_REQUIRED, verify_identity
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -24,6 +27,10 @@ app = FastAPI(
     version="1.0.0"
 )
 
+configure_logging("analytics-service", context=log_context)
+tracer.configure("analytics-service")
+app.add_middleware(TracingMiddleware)
+
 # Start RabbitMQ consumer
 @app.on_event("startup")
 async def startup_event():
@@ -31,12 +38,21 @@ async def startup_event():
     init_consumer()
 
 
-def get_user_id(x_user_id: str = Header(...)) -> int:
-    """Extract user ID from header"""
-    try:
-        return int(x_user_id)
-    except ValueError:
+def get_user_id(
+    x_user_id: Optional[str] = Header(None),
+    x_internal_identity: Optional[str] = Header(None),
+) -> str:
+    """Extract user ID from the gateway's signed identity header (or the plain X-User-ID header)"""
+    if x_internal_identity is not None:
+        claims = verify_identity(x_internal_identity)
+        if claims is None:
+            raise HTTPException(status_code=401, detail="Invalid or expired internal identity")
+        return claims["user_id"]
+    if IDENTITY_REQUIRED:
+        raise HTTPException(status_code=401, detail="Internal identity required")
+    if not x_user_id:
         raise HTTPException(status_code=400, detail="Invalid user ID")
+    return x_user_id
 
 
 @app.get("/health")
@@ -50,7 +66,7 @@ async def health_check():
 @app.post("/api/analytics/budget", response_model=BudgetResponse, status_code=201)
 async def create_budget(
     budget: BudgetCreate,
-    user_id: int = Depends(get_user_id),
+    user_id: str = Depends(get_user_id),
     db: Session = Depends(get_db)
 ):
     """Create a new budget"""
@@ -64,7 +80,7 @@ async def create_budget(
 
 @app.get("/api/analytics/budget", response_model=List[BudgetResponse])
 async def list_budgets(
-    user_id: int = Depends(get_user_id),
+    user_id: str = Depends(get_user_id),
     db: Session = Depends(get_db)
 ):
     """List all budgets for user"""
@@ -74,7 +90,7 @@ async def list_budgets(
 
 @app.get("/api/analytics/budget-status", response_model=List[BudgetStatus])
 async def get_budget_status(
-    user_id: int = Depends(get_user_id),
+    user_id: str = Depends(get_user_id),
     db: Session = Depends(get_db)
 ):
     """Get budget status with spending comparison"""
@@ -114,7 +130,7 @@ async def get_budget_status(
 
 @app.get("/api/analytics/summary", response_model=SpendingSummary)
 async def get_spending_summary(
-    user_id: int = Depends(get_user_id),
+    user_id: str = Depends(get_user_id),
     start_date: datetime = None,
     end_date: datetime = None,
     db: Session = Depends(get_db)
@@ -148,7 +164,7 @@ async def get_spending_summary(
 
 @app.get("/api/analytics/by-category", response_model=List[CategoryBreakdown])
 async def get_category_breakdown(
-    user_id: int = Depends(get_user_id),
+    user_id: str = Depends(get_user_id),
     start_date: datetime = None,
     end_date: datetime = None,
     db: Session = Depends(get_db)
@@ -206,7 +222,7 @@ async def get_category_breakdown(
 
 @app.get("/api/analytics/trends", response_model=SpendingTrends)
 async def get_spending_trends(
-    user_id: int = Depends(get_user_id),
+    user_id: str = Depends(get_user_id),
     period: str = "monthly",  # 'daily', 'weekly', 'monthly'
     days: int = 30,
     db: Session = Depends(get_db)
@@ -15,7 +15,7 @@ class BudgetCreate(BaseModel):
 class BudgetResponse(BaseModel):
     """Schema for budget response"""
     id: int
-    user_id: int
+    user_id: str
     category_id: Optional[int]
     amount: float
     period: str
@@ -0,0 +1,40 @@
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from accounts.identity import IDENTITY_HEADER, IDENTITY_REQUIRED, verify_identity
+
+
+class TrustedUser:
+    """User identity asserted by the gateway; no database row is loaded"""
+
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, claims: dict):
+        self.id = self.pk = claims["user_id"]
+        self.email = claims.get("email")
+        self.username = claims.get("username")
+
+    def __str__(self):
+        return self.email or str(self.id)
+
+
+class InternalIdentityAuthentication(BaseAuthentication):
+    """Authenticate from the gateway's signed X-Internal-Identity header.
+
+    One HMAC check replaces the JWT decode and the per-request User query done by
+    JWTAuthentication. Requests without the header fall through to the next
+    authentication class unless INTERNAL_IDENTITY_REQUIRED is set.
+    """
+
+    def authenticate(self, request):
+        value = request.headers.get(IDENTITY_HEADER)
+        if value is None:
+            if IDENTITY_REQUIRED:
+                raise AuthenticationFailed("Internal identity required")
+            return None
+        claims = verify_identity(value)
+        if claims is None:
+            raise AuthenticationFailed("Invalid or expired internal identity")
+        return TrustedUser(claims), claims
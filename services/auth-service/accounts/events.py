@@ -1,7 +1,11 @@
 import pika
 import json
+import logging
 import os
 from django.conf import settings
+from accounts.tracing import inject, span
+
+logger = logging.getLogger(__name__)
 
 
 def get_rabbitmq_connection():
@@ -26,27 +30,34 @@ def get_rabbitmq_connection():
 
 
 def publish_event(event_type:str, user_data: dict):
-    try:
-        connection = get_rabbitmq_connection()
-        channel = connection.channel()
-
-        # Declare queue (safe to call multiple times)
-        channel.queue_declare(queue='user_events', durable=True)
-
-        message = {
-            'event_type': event_type,
-            'data': user_data
-        }
-
-        channel.basic_publish(
-            exchange='',
-            routing_key='user_events',
-            body=json.dumps(message),
-            properties=pika.BasicProperties(
-                delivery_mode=2  # make message persistent
+    with span("publish user_events", "producer", attributes={
+        "messaging.system": "rabbitmq",
+        "messaging.destination": "user_events",
+        "event.type": event_type,
+    }) as publish_span:
+        try:
+            connection = get_rabbitmq_connection()
+            channel = connection.channel()
+
+            # Declare queue (safe to call multiple times)
+            channel.queue_declare(queue='user_events', durable=True)
+
+            message = {
+                'event_type': event_type,
+                'data': user_data
+            }
+
+            channel.basic_publish(
+                exchange='',
+                routing_key='user_events',
+                body=json.dumps(message),
+                properties=pika.BasicProperties(
+                    delivery_mode=2,  # make message persistent
+                    headers=inject({})  # trace context for the consumers
+                )
             )
-        )
-        connection.close()
-        print(f"Event published: {event_type}")
-    except Exception as e:
-        print(f"Failed to publish event: {e}")
+            connection.close()
+            logger.info("Event published", extra={"event_type": event_type})
+        except Exception as e:
+            logger.error(f"Failed to publish event: {e}", exc_info=True, extra={"event_type": event_type})
+            publish_span.record_error(e)
@@ -0,0 +1,185 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import time
+from typing import Callable, Optional
+
+# Structured logging shared verbatim by every service. Log calls only put the record
+# on a bounded in-memory queue; a background listener thread formats each record as
+# one JSON line (with secrets redacted) and writes it to stdout, so a slow or
+# blocked stdout never stalls request handling. When the queue is full records are
+# dropped and counted instead of blocking.
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+RECORD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {"message", "asctime", "context", "sampled"}
+
+REDACTED = "[redacted]"
+SENSITIVE_FIELDS = {"password", "password2", "token", "access", "refresh", "authorization", "secret", "api_key"}
+BEARER_PATTERN = re.compile(r"(?i)\bbearer\s+[\w\-.~+/]+=*")
+JWT_PATTERN = re.compile(r"\beyJ[\w-]+\.[\w-]+\.[\w-]*")
+EMAIL_PATTERN = re.compile(r"\b([\w.+-])[\w.+-]*@([\w-]+(?:\.[\w-]+)+)")
+SECRET_WORDS = ("password", "token", "access", "refresh", "secret")
+SECRET_ASSIGNMENT_PATTERN = re.compile(r"(?i)(['\"]?(?:password2?|token|access|refresh|secret)['\"]?\s*[:=]\s*)(['\"]?)[^'\",}\s]+")
+
+
+def redact(text: str) -> str:
+    """Mask bearer tokens, JWTs, secret-looking assignments and email addresses"""
+    # Cheap substring checks first: most lines contain none of these
+    lowered = text.lower()
+    if "bearer" in lowered:
+        text = BEARER_PATTERN.sub(f"Bearer {REDACTED}", text)
+    if "eyJ" in text:
+        text = JWT_PATTERN.sub(REDACTED, text)
+    if any(word in lowered for word in SECRET_WORDS):
+        text = SECRET_ASSIGNMENT_PATTERN.sub(rf"\1\2{REDACTED}", text)
+    if "@" in text:
+        text = EMAIL_PATTERN.sub(r"\1***@\2", text)
+    return text
+
+
+def redact_value(key: str, value):
+    if key.lower() in SENSITIVE_FIELDS:
+        return REDACTED
+    if isinstance(value, str):
+        return redact(value)
+    if isinstance(value, dict):
+        return {k: redact_value(str(k), v) for k, v in value.items()}
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, service, logger, message, trace ids and extras"""
+
+    def __init__(self, service_name: str, redaction: bool = True):
+        super().__init__()
+        self.service_name = service_name
+        self.redaction = redaction
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "service": self.service_name,
+            "logger": record.name,
+            "message": redact(message) if self.redaction else message,
+        }
+        entry.update(getattr(record, "context", None) or {})
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = redact_value(key, value) if self.redaction else value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of high-volume records (marked sampled, or from a sampled logger)"""
+
+    def __init__(self, rate: float, loggers=()):
+        super().__init__()
+        self.rate = rate
+        self.loggers = set(loggers)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if not getattr(record, "sampled", False) and record.name not in self.loggers:
+            return True
+        if random.random() >= self.rate:
+            return False
+        record.sample_rate = self.rate
+        return True
+
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """Hand records to the listener thread without formatting or blocking the caller"""
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int, context: Optional[Callable[[], dict]] = None):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.context = context
+        self.dropped = 0
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # The queue is thread-safe, so skip the per-handler lock of Handler.handle
+        if not self.filter(record):
+            return False
+        self.emit(record)
+        return True
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Capture the caller's trace ids now: the listener thread has its own context
+        if self.context is not None:
+            record.context = self.context()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+
+class JsonLogging:
+    """Process-wide logging setup; configure() replaces the root handlers once"""
+
+    def __init__(self):
+        self.handler: Optional[QueueLogHandler] = None
+        self.listener: Optional[logging.handlers.QueueListener] = None
+
+    def configure(self, service_name: str, context: Optional[Callable[[], dict]] = None):
+        if self.listener is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter(
+            os.getenv("SERVICE_NAME", service_name),
+            redaction=os.getenv("LOG_REDACT", "true").lower() in ("1", "true", "yes", "on"),
+        ))
+        self.handler = QueueLogHandler(queue.SimpleQueue(), int(os.getenv("LOG_QUEUE_SIZE", "10000")), context)
+        sampled_loggers = [name.strip() for name in os.getenv("LOG_SAMPLED_LOGGERS", "uvicorn.access,httpx").split(",") if name.strip()]
+        self.handler.addFilter(SamplingFilter(float(os.getenv("LOG_SAMPLE_RATE", "0.1")), sampled_loggers))
+
+        # Skip per-record work the JSON lines never use (caller lookup, thread and process names)
+        logging._srcfile = None
+        logging.logThreads = False
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(self.handler)
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        # Route server loggers (uvicorn, django) through the same queue
+        for name in ("uvicorn", "uvicorn.error", "uvicorn.access", "django"):
+            logging.getLogger(name).handlers = []
+            logging.getLogger(name).propagate = True
+
+        self.listener = logging.handlers.QueueListener(self.handler.queue, output, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.shutdown)
+
+    def shutdown(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def stats(self) -> dict:
+        if self.handler is None:
+            return {"queued": 0, "dropped": 0}
+        return {"queued": self.handler.queue.qsize(), "dropped": self.handler.dropped}
+
+
+json_logging = JsonLogging()
+
+
+def configure_logging(service_name: str, context: Optional[Callable[[], dict]] = None):
+    """Send all logging through the JSON queue; `context` adds per-record fields such as trace ids"""
+    json_logging.configure(service_name, context)
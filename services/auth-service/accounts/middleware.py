@@ -0,0 +1,44 @@
+from django.db import connection
+
+from accounts.jsonlog import configure_logging
+from accounts.tracing import finish_span, log_context, parse_traceparent, span, start_span, tracer
+
+
+class TracingMiddleware:
+    """Record a server span per request (continuing the gateway's trace) and a span per SQL query"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        configure_logging("auth-service", context=log_context)
+        tracer.configure("auth-service")
+
+    def __call__(self, request):
+        current = start_span(
+            f"{request.method} {request.path}",
+            "server",
+            parse_traceparent(request.headers.get("traceparent")),
+            {"http.method": request.method, "http.target": request.path},
+        )
+        try:
+            with connection.execute_wrapper(trace_sql):
+                response = self.get_response(request)
+        except Exception as e:
+            current.record_error(e)
+            raise
+        finally:
+            match = getattr(request, "resolver_match", None)
+            if match is not None and match.route:
+                current.name = f"{request.method} /{match.route}"
+                current.set_attribute("http.route", f"/{match.route}")
+            finish_span(current)
+        current.set_attribute("http.status_code", response.status_code)
+        response["X-Trace-Id"] = current.context.trace_id
+        return response
+
+
+def trace_sql(execute, sql, params, many, context):
+    with span(sql.split(None, 1)[0].upper() if sql else "SQL", "client", attributes={
+        "db.system": connection.vendor,
+        "db.statement": sql[:1000],
+    }):
+        return execute(sql, params, many, context)
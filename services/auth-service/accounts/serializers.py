@@ -32,7 +32,6 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data.pop('password2')
-        print("validated_data", validated_data)
         user = User.objects.create_user(**validated_data)
         return user
     
@@ -0,0 +1,17 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+User = get_user_model()
+
+
+def profile_cache_key(user_id) -> str:
+    return f"profile:{user_id}"
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_profile(sender, instance, **kwargs):
+    """Any change to a user (profile update, admin edit) invalidates its cached profile"""
+    cache.delete(profile_cache_key(instance.pk))
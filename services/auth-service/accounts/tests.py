@@ -1,3 +1,38 @@
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from accounts.identity import IDENTITY_HEADER, sign_identity
+from accounts.models import User
+
+
+class GatewayProfileTests(TestCase):
+    """GET /api/users/profile for a request carrying the gateway's identity header"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='ada@example.com', password='pw', username='ada', name='Ada Lovelace')
+        self.client = APIClient()
+        self.client.credentials(**{
+            f"HTTP_{IDENTITY_HEADER.upper().replace('-', '_')}": sign_identity(str(self.user.id), self.user.email, self.user.username)
+        })
+
+    def test_profile_is_queried_once_then_served_from_the_cache(self):
+        with self.assertNumQueries(1):
+            first = self.client.get('/api/users/profile')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/users/profile')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['name'], 'Ada Lovelace')
+        self.assertEqual(second.json(), first.json())
+
+    def test_saving_the_user_invalidates_the_cached_profile(self):
+        self.client.get('/api/users/profile')
+        self.user.name = 'Augusta Ada King'
+        self.user.save()
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/profile')
+
+        self.assertEqual(response.json()['name'], 'Augusta Ada King')
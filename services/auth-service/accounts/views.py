@@ -3,12 +3,15 @@ from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
 from django.contrib.auth import authenticate, get_user_model
 from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 from accounts.jwt_serializers import CustomTokenObtainPairSerializer
 from accounts.events import publish_event
+from accounts.signals import profile_cache_key
 from accounts.serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
@@ -108,7 +111,23 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = UserProfileSerializer
     
     def get_object(self):
-        return self.request.user
+        user = self.request.user
+        if isinstance(user, User):
+            return user
+        # Identity asserted by the gateway: load the row only because the profile needs it
+        return generics.get_object_or_404(User, pk=user.pk)
+
+    def retrieve(self, request, *args, **kwargs):
+        if isinstance(request.user, User):
+            return super().retrieve(request, *args, **kwargs)
+        # Gateway-authenticated: the claims lack the profile fields, so serve them from
+        # the cache and only query the row on a miss (saving a User drops its entry)
+        key = profile_cache_key(request.user.pk)
+        data = cache.get(key)
+        if data is None:
+            data = self.get_serializer(self.get_object()).data
+            cache.set(key, data, settings.PROFILE_CACHE_TTL)
+        return Response(data)
     
     def get_serializer_class(self):
         if self.request.method == 'PUT':
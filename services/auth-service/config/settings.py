@@ -53,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'accounts.middleware.TracingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -154,6 +155,7 @@ AUTH_USER_MODEL = 'accounts.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
+        'accounts.authentication.InternalIdentityAuthentication',
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
@@ -177,6 +179,15 @@ SIMPLE_JWT = {
     'TOKEN_OBTAIN_SERIALIZER': 'accounts.jwt_serializers.CustomTokenObtainPairSerializer',
 }
 
+# Profiles served to gateway-authenticated requests (no User row loaded) are cached
+# here; saving a User drops its entry, PROFILE_CACHE_TTL bounds staleness across processes
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', '60'))
+
 # CORS Settings
 CORS_ALLOW_ALL_ORIGINS = True  # In production, specify exact origins
 CORS_ALLOW_CREDENTIALS = True
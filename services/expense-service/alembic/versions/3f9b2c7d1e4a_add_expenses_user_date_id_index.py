@@ -0,0 +1,31 @@
+"""add expenses (user_id, date desc, id desc) index
+
+Revision ID: 3f9b2c7d1e4a
+Revises: aa8e9d4540e1
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9b2c7d1e4a'
+down_revision: Union[str, Sequence[str], None] = 'aa8e9d4540e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Matches the list_expenses ordering, so keyset pages are index range scans
+    op.create_index('ix_expenses_user_date_id', 'expenses',
+                    ['user_id', sa.text('date DESC'), sa.text('id DESC')],
+                    unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_expenses_user_date_id', table_name='expenses')
@@ -0,0 +1,52 @@
+"""add covering and per-category listing indexes concurrently
+
+Revision ID: 8e4d1a6c2b7f
+Revises: 3f9b2c7d1e4a
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4d1a6c2b7f'
+down_revision: Union[str, Sequence[str], None] = '3f9b2c7d1e4a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def create_index_concurrently(name, columns, **kw) -> None:
+    # A failed concurrent build leaves an INVALID index behind; clear it so a rerun can succeed
+    op.drop_index(name, table_name='expenses', postgresql_concurrently=True, if_exists=True)
+    op.create_index(name, 'expenses', columns, unique=False, postgresql_concurrently=True, **kw)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        # list_expenses: user's rows by (date desc, id desc); the category and amount
+        # filters are checked from the index entries before visiting the heap
+        create_index_concurrently('ix_expenses_user_date_id_incl',
+                                  ['user_id', sa.text('date DESC'), sa.text('id DESC')],
+                                  postgresql_include=['category_id', 'amount'])
+        # list_expenses?category_id=: equality on category, still in list order
+        create_index_concurrently('ix_expenses_user_category_date_id',
+                                  ['user_id', 'category_id', sa.text('date DESC'), sa.text('id DESC')])
+        # Superseded: both are prefixes of the indexes above
+        op.drop_index('ix_expenses_user_date_id', table_name='expenses', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_expenses_user_id', table_name='expenses', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_expenses_user_id', 'expenses', ['user_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_expenses_user_date_id', 'expenses',
+                        ['user_id', sa.text('date DESC'), sa.text('id DESC')],
+                        unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_expenses_user_category_date_id', table_name='expenses', postgresql_concurrently=True)
+        op.drop_index('ix_expenses_user_date_id_incl', table_name='expenses', postgresql_concurrently=True)
@@ -0,0 +1,83 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from tracker.database import get_db
+from tracker.main import app
+from tracker.models import Base
+
+
+class SessionAdapter:
+    """The AsyncSession calls the tracker makes, served by a sync Session so tests run on plain sqlite"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def add(self, instance):
+        self.session.add(instance)
+
+    async def execute(self, *args, **kwargs):
+        return self.session.execute(*args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return self.session.scalar(*args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return self.session.scalars(*args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return self.session.get(*args, **kwargs)
+
+    async def flush(self):
+        self.session.flush()
+
+    async def commit(self):
+        self.session.commit()
+
+    async def refresh(self, instance):
+        self.session.refresh(instance)
+
+    async def delete(self, instance):
+        self.session.delete(instance)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def client(session_factory):
+    async def test_db():
+        db = session_factory()
+        try:
+            yield SessionAdapter(db)
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = test_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def statements(engine):
+    """SQL text of every statement executed on the test database"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from tracker.models import Category, Expense
+
+USER = {"X-User-ID": "user-1"}
+
+
+@pytest.fixture
+def expenses(session_factory):
+    with session_factory() as db:
+        db.add_all([Category(id=1, name="Food"), Category(id=2, name="Travel")])
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        db.add_all([
+            Expense(user_id="user-1", amount=i + 1, category_id=1 + i % 2, date=start + timedelta(hours=i))
+            for i in range(150)
+        ])
+        db.commit()
+
+
+def selects(statements):
+    return [statement for statement in statements if statement.lstrip().upper().startswith("SELECT")]
+
+
+@pytest.mark.parametrize("limit", [1, 50, 100])
+def test_list_expenses_is_one_select_at_any_page_size(client, statements, expenses, limit):
+    response = client.get(f"/api/expenses?limit={limit}", headers=USER)
+
+    assert response.status_code == 200
+    assert len(response.json()) == limit
+    assert {item["category_name"] for item in response.json()} <= {"Food", "Travel"}
+    assert len(selects(statements)) == 1
+
+
+@pytest.mark.parametrize("limit", [1, 50, 100])
+def test_cursor_page_is_one_select_at_any_page_size(client, statements, expenses, limit):
+    response = client.get(f"/api/expenses?cursor=&limit={limit}", headers=USER)
+
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == limit
+    assert len(selects(statements)) == 1
+
+
+def test_get_expense_is_one_select(client, statements, expenses):
+    response = client.get("/api/expenses/7", headers=USER)
+
+    assert response.status_code == 200
+    assert response.json()["category_name"] == "Food"
+    assert len(selects(statements)) == 1
+
+
+def test_cursor_pages_walk_every_expense_once_in_order(client, expenses):
+    seen, cursor = [], ""
+    while cursor is not None:
+        page = client.get(f"/api/expenses?cursor={cursor}&limit=40", headers=USER).json()
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+
+    assert len(seen) == 150
+    # Newest first: expense i was created at start + i hours, with id i + 1
+    assert seen == list(range(150, 0, -1))
+
+
+def test_cursor_breaks_date_ties_by_id(client, session_factory):
+    same_date = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    with session_factory() as db:
+        db.add(Category(id=1, name="Food"))
+        db.add_all([Expense(user_id="user-1", amount=i + 1, category_id=1, date=same_date) for i in range(5)])
+        db.commit()
+
+    first = client.get("/api/expenses?cursor=&limit=2", headers=USER).json()
+    second = client.get(f"/api/expenses?cursor={first['next_cursor']}&limit=2", headers=USER).json()
+    third = client.get(f"/api/expenses?cursor={second['next_cursor']}&limit=2", headers=USER).json()
+
+    assert [item["id"] for item in first["items"]] == [5, 4]
+    assert [item["id"] for item in second["items"]] == [3, 2]
+    assert [item["id"] for item in third["items"]] == [1]
+
+
+def test_last_page_has_no_next_cursor(client, expenses):
+    full = client.get("/api/expenses?cursor=&limit=150", headers=USER).json()
+    beyond = client.get("/api/expenses?cursor=&limit=151", headers=USER).json()
+
+    assert len(full["items"]) == 150 and full["next_cursor"] is None
+    assert len(beyond["items"]) == 150 and beyond["next_cursor"] is None
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "W10", "WyJ4IiwxXQ", "WyIyMDI0LTAxLTAxIiwieiJd"])
+def test_malformed_cursor_is_a_400(client, expenses, cursor):
+    response = client.get(f"/api/expenses?cursor={cursor}", headers=USER)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,87 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from tracker.exporter import EXPORT_COLUMNS, accepts_gzip, export_body
+
+ROWS = [
+    SimpleNamespace(
+        id=1, date=datetime(2024, 1, 2, 9, 30, tzinfo=timezone.utc), amount=12.5, category_id=1,
+        category_name="Food", description='Lunch, "team"\nsecond line', created_at=datetime(2024, 1, 2, 10, 0),
+        updated_at=None,
+    ),
+    SimpleNamespace(
+        id=2, date=datetime(2024, 1, 3), amount=3.0, category_id=2, category_name="Travel", description=None,
+        created_at=datetime(2024, 1, 3, 8, 0), updated_at=datetime(2024, 1, 4, 8, 0),
+    ),
+]
+
+
+async def partitions(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def export(export_format: str, compress: bool = False, rows=ROWS, size: int = 1) -> bytes:
+    async def collect():
+        return b"".join([chunk async for chunk in export_body(partitions(rows, size), export_format, compress)])
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, deflate, br", True),
+    ("br;q=1.0, gzip;q=0.5", True),
+    ("*", True),
+    ("gzip;q=0", False),
+    ("GZIP; q=0.000", False),
+    ("identity", False),
+    ("", False),
+    (None, False),
+])
+def test_accepts_gzip(accept_encoding, expected):
+    assert accepts_gzip(accept_encoding) is expected
+
+
+def test_csv_export_has_a_header_and_one_record_per_row():
+    records = list(csv.reader(io.StringIO(export("csv").decode(), newline="")))
+
+    assert records[0] == EXPORT_COLUMNS
+    assert records[1] == [
+        "1", "2024-01-02T09:30:00+00:00", "12.5", "1", "Food", 'Lunch, "team"\nsecond line', "2024-01-02T10:00:00", "",
+    ]
+    assert records[2][EXPORT_COLUMNS.index("description")] == ""
+    assert len(records) == 3
+
+
+def test_csv_export_of_no_rows_is_just_the_header():
+    assert export("csv", rows=[]) == (",".join(EXPORT_COLUMNS) + "\r\n").encode()
+
+
+def test_ndjson_export_is_one_object_per_line():
+    lines = export("ndjson").decode().splitlines()
+
+    assert [json.loads(line) for line in lines] == [
+        {
+            "id": 1, "date": "2024-01-02T09:30:00+00:00", "amount": 12.5, "category_id": 1, "category_name": "Food",
+            "description": 'Lunch, "team"\nsecond line', "created_at": "2024-01-02T10:00:00", "updated_at": None,
+        },
+        {
+            "id": 2, "date": "2024-01-03T00:00:00", "amount": 3.0, "category_id": 2, "category_name": "Travel",
+            "description": None, "created_at": "2024-01-03T08:00:00", "updated_at": "2024-01-04T08:00:00",
+        },
+    ]
+
+
+@pytest.mark.parametrize("export_format", ["csv", "ndjson"])
+@pytest.mark.parametrize("rows", [ROWS, ROWS * 500, []])
+def test_gzip_export_decompresses_to_the_plain_export(export_format, rows):
+    compressed = export(export_format, compress=True, rows=rows, size=100)
+
+    assert compressed[:2] == b"\x1f\x8b"
+    assert gzip.decompress(compressed) == export(export_format, rows=rows, size=100)
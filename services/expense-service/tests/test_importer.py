@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import pytest
+
+from tracker.importer import csv_records, expense_from_record, import_format, ndjson_records
+from tracker.models import Category, Expense, OutboxEvent
+
+USER = {"X-User-ID": "user-1"}
+
+
+async def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def read(reader, data: bytes, size: int = 3) -> list:
+    """All records of an upload delivered in `size`-byte chunks"""
+    async def collect():
+        return [record async for record in reader(chunked(data, size))]
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("content_type, requested, expected", [
+    ("text/csv; charset=utf-8", None, "csv"),
+    ("application/x-ndjson", None, "ndjson"),
+    ("application/jsonl", None, "ndjson"),
+    ("application/json", None, None),
+    ("application/json", "CSV", "csv"),
+    ("text/csv", "xml", None),
+])
+def test_import_format(content_type, requested, expected):
+    assert import_format(content_type, requested) == expected
+
+
+@pytest.mark.parametrize("size", [1, 3, 1024])
+def test_csv_records_survive_any_chunking(size):
+    data = "\ufeffAmount,Category,Description\r\n12.5,Food,\"café, with \"\"quotes\"\"\"\r\n\r\n3,Travel,\r\n".encode()
+
+    assert read(csv_records, data, size) == [
+        (2, {"amount": "12.5", "category": "Food", "description": 'café, with "quotes"'}, None),
+        (4, {"amount": "3", "category": "Travel"}, None),
+    ]
+
+
+def test_csv_quoted_field_spans_lines():
+    data = b'amount,description\n1,"first\nsecond"\n2,plain\n'
+
+    assert read(csv_records, data) == [
+        (2, {"amount": "1", "description": "first\nsecond"}, None),
+        (4, {"amount": "2", "description": "plain"}, None),
+    ]
+
+
+def test_csv_column_mismatch_and_unterminated_quote():
+    data = b'amount,category_id\n1,2,3\n4,1\n5,"open\n'
+
+    assert read(csv_records, data) == [
+        (2, None, "Expected 2 columns, got 3"),
+        (3, {"amount": "4", "category_id": "1"}, None),
+        (4, None, "Unterminated quoted field"),
+    ]
+
+
+def test_ndjson_records():
+    data = b'{"amount": 1, "category_id": 1}\n\nnot json\n[1, 2]\r\n{"amount": 2}'
+
+    records = read(ndjson_records, data)
+
+    assert records[0] == (1, {"amount": 1, "category_id": 1}, None)
+    assert records[1][0] == 3 and records[1][2].startswith("Invalid JSON")
+    assert records[2] == (4, None, "Expected a JSON object")
+    assert records[3] == (5, {"amount": 2}, None)
+
+
+def test_expense_from_record_resolves_category_names():
+    expense = expense_from_record({"amount": "9.5", "category": " Food "}, {1}, {"Food": 1})
+
+    assert expense.amount == 9.5
+    assert expense.category_id == 1
+
+
+@pytest.mark.parametrize("fields, message", [
+    ({"amount": 1, "category": "Rent"}, "Unknown category 'Rent'"),
+    ({"amount": 1, "category_id": 7}, "category_id 7 not found"),
+    ({"amount": -1, "category_id": 1}, "amount: "),
+    ({"category_id": 1}, "amount: Field required"),
+])
+def test_expense_from_record_rejects_invalid_rows(fields, message):
+    with pytest.raises(ValueError, match=message):
+        expense_from_record(fields, {1}, {"Food": 1})
+
+
+def test_import_endpoint_loads_valid_rows_and_reports_rejections(client, session_factory, monkeypatch):
+    monkeypatch.setattr("tracker.main.IMPORT_BATCH_SIZE", 2)
+    with session_factory() as db:
+        db.add(Category(id=1, name="Food"))
+        db.commit()
+    rows = [{"amount": i + 1, "category": "Food"} for i in range(5)] + [{"amount": 1, "category": "Rent"}]
+    body = "\n".join(json.dumps(row) for row in rows).encode()
+
+    response = client.post(
+        "/api/expenses/import", content=body, headers={**USER, "Content-Type": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["accepted"], report["rejected"]) == (5, 1)
+    assert report["errors"] == [{"line": 6, "error": "Unknown category 'Rent'"}]
+    with session_factory() as db:
+        assert db.query(Expense).filter_by(user_id="user-1").count() == 5
+        # One expense.imported event per batch: 2 + 2 + 1 rows
+        events = db.query(OutboxEvent).order_by(OutboxEvent.id).all()
+        assert [len(json.loads(event.body)["data"]["expenses"]) for event in events] == [2, 2, 1]
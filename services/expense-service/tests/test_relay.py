@@ -0,0 +1,102 @@
+import json
+
+import pytest
+from sqlalchemy import event, select
+
+from tracker.events import add_event
+from tracker.models import Category, OutboxEvent
+from tracker.relay import OutboxRelay
+
+
+class FakeChannel:
+    """A confirm-mode channel whose broker nacks the publish after `confirm` messages"""
+
+    is_open = True
+
+    def __init__(self, confirm=None):
+        self.confirm = confirm
+        self.confirmed = []
+
+    def confirm_delivery(self):
+        pass
+
+    def queue_declare(self, queue, durable):
+        pass
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        if self.confirm is not None and len(self.confirmed) == self.confirm:
+            raise RuntimeError("Message was nacked")
+        self.confirmed.append(json.loads(body)["data"]["expense_id"])
+
+
+class FakeConnection:
+    is_open = True
+
+    def __init__(self, channel):
+        self._channel = channel
+
+    def channel(self):
+        return self._channel
+
+    def close(self):
+        self.is_open = False
+
+
+@pytest.fixture
+def outbox(session_factory):
+    with session_factory() as db:
+        for expense_id in range(1, 6):
+            add_event(db, "expense.created", {"expense_id": expense_id})
+        db.commit()
+
+
+def remaining(session_factory):
+    with session_factory() as db:
+        return [json.loads(body)["data"]["expense_id"] for body in db.scalars(select(OutboxEvent.body).order_by(OutboxEvent.id))]
+
+
+def test_nack_mid_batch_deletes_only_the_confirmed_prefix(engine, session_factory, outbox, monkeypatch):
+    channel = FakeChannel(confirm=2)
+    monkeypatch.setattr("tracker.relay.connect", lambda: FakeConnection(channel))
+    relay = OutboxRelay(engine, batch_size=5, poll_interval=0, retry_interval=0)
+
+    with pytest.raises(RuntimeError, match="nacked"):
+        relay.relay_batch()
+
+    assert channel.confirmed == [1, 2]
+    assert relay.published == 2
+    assert remaining(session_factory) == [3, 4, 5]
+
+    # The next pass reconnects and publishes the rest, in order
+    relay.close()
+    channel = FakeChannel()
+    monkeypatch.setattr("tracker.relay.connect", lambda: FakeConnection(channel))
+
+    assert relay.relay_batch() == 3
+    assert channel.confirmed == [3, 4, 5]
+    assert remaining(session_factory) == []
+    assert relay.relay_batch() == 0
+
+
+def test_relay_batch_publishes_at_most_batch_size(engine, session_factory, outbox, monkeypatch):
+    channel = FakeChannel()
+    monkeypatch.setattr("tracker.relay.connect", lambda: FakeConnection(channel))
+    relay = OutboxRelay(engine, batch_size=3, poll_interval=0, retry_interval=0)
+
+    assert relay.relay_batch() == 3
+    assert remaining(session_factory) == [4, 5]
+
+
+def test_create_expense_writes_its_event_in_the_same_transaction(client, engine, session_factory, statements):
+    with session_factory() as db:
+        db.add(Category(id=1, name="Food"))
+        db.commit()
+    statements.clear()
+    event.listen(engine, "commit", lambda conn: statements.append("COMMIT"))
+
+    response = client.post("/api/expenses", json={"amount": 12.5, "category_id": 1}, headers={"X-User-ID": "user-1"})
+
+    assert response.status_code == 201
+    writes = [s.split()[2] if s.startswith("INSERT") else s for s in statements if s.startswith(("INSERT", "COMMIT"))]
+    assert writes == ["expenses", "outbox_events", "COMMIT"]
+    assert remaining(session_factory) == [response.json()["id"]]
@@ -1,6 +1,6 @@
-from sqlalchemy import create_engine 
-from sqlalchemy.orm import sessionmaker 
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from dotenv import load_dotenv
+from tracker.tracing import instrument_engine
 import os 
 
 load_dotenv()
@@ -14,13 +14,23 @@ DB_PORT = os.getenv("EXPENSE_DB_PORT", "5432")
 
 DATABASE_URL = f"postgresql+psycopg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Connection pool per worker process: pool_size connections are kept open,
+# up to max_overflow more are opened under bursts, and a request waits at most
+# pool_timeout seconds for a free connection before failing.
+POOL_SETTINGS = dict(
+    pool_size=int(os.getenv("EXPENSE_DB_POOL_SIZE", "10")),
+    max_overflow=int(os.getenv("EXPENSE_DB_MAX_OVERFLOW", "10")),
+    pool_timeout=float(os.getenv("EXPENSE_DB_POOL_TIMEOUT", "5")),
+    pool_recycle=int(os.getenv("EXPENSE_DB_POOL_RECYCLE", "1800")),
+    pool_pre_ping=os.getenv("EXPENSE_DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes", "on"),
+)
 
-def get_db():
+# psycopg 3 runs in async mode under create_async_engine, so queries never block the event loop
+engine = create_async_engine(DATABASE_URL, **POOL_SETTINGS)
+instrument_engine(engine.sync_engine)
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+async def get_db():
     """Dependency to get database session"""
-    db = SessionLocal()
-    try:
-        yield db 
-    finally:
-        db.close()
\ No newline at end of file
+    async with SessionLocal() as db:
+        yield db
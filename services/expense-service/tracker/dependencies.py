@@ -1,7 +1,19 @@
 from fastapi import Header, HTTPException, status
+from typing import Optional
+from tracker.identity import IDENTITY_REQUIRED, verify_identity
 
-def get_user_id(x_user_id: str = Header(...)) -> str:
-    """Extract User Id from Header"""
+def get_user_id(
+    x_user_id: Optional[str] = Header(None),
+    x_internal_identity: Optional[str] = Header(None),
+) -> str:
+    """Extract User Id from the gateway's signed identity header (or the plain X-User-ID header)"""
+    if x_internal_identity is not None:
+        claims = verify_identity(x_internal_identity)
+        if claims is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired internal identity")
+        return claims["user_id"]
+    if IDENTITY_REQUIRED:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Internal identity required")
     if not x_user_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid User Id")
-    return x_user_id
\ No newline at end of file
+    return x_user_id
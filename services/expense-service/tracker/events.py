@@ -1,49 +1,43 @@
 import pika
 import json
+import logging
 import os
+from tracker.models import OutboxEvent
+from tracker.tracing import inject
 
+logger = logging.getLogger(__name__)
 
-def publish_event(event_type: str, data: dict):
-    """Publish event to RabbitMQ"""
-    try:
-        credentials = pika.PlainCredentials(
-            os.getenv('RABBITMQ_USER', 'guest'),
-            os.getenv('RABBITMQ_PASSWORD', 'guest')
-        )
-        host = os.getenv('RABBITMQ_HOST', 'localhost')
-        port = int(os.getenv('RABBITMQ_PORT', '5672'))
-        
-        print(f"🔌 Connecting to RabbitMQ at {host}:{port}...")
-        
-        connection = pika.BlockingConnection(
-            pika.ConnectionParameters(
-                host=host,
-                port=port,
-                credentials=credentials
-            )
-        )
-        channel = connection.channel()
-        channel.confirm_delivery() # Enable publisher confirmations
-        
-        channel.queue_declare(queue='expense_events', durable=True)
-        
-        message = {
+EXPENSE_EVENTS_QUEUE = 'expense_events'
+
+
+def add_event(db, event_type: str, data: dict):
+    """Queue an event in the outbox; it is stored (and later published by the relay) only if the caller's transaction commits"""
+    db.add(OutboxEvent(
+        event_type=event_type,
+        body=json.dumps({
             'event_type': event_type,
             'data': data
-        }
-        
-        channel.basic_publish(
-            exchange='',
-            routing_key='expense_events',
-            body=json.dumps(message, default=str),
-            properties=pika.BasicProperties(
-                delivery_mode=2,  # make message persistent
-            )
+        }, default=str),
+        headers=inject({}),  # trace context of the request, for the consumers
+    ))
+
+
+def connect() -> pika.BlockingConnection:
+    """Open a connection to RabbitMQ"""
+    credentials = pika.PlainCredentials(
+        os.getenv('RABBITMQ_USER', 'guest'),
+        os.getenv('RABBITMQ_PASSWORD', 'guest')
+    )
+    host = os.getenv('RABBITMQ_HOST', 'localhost')
+    port = int(os.getenv('RABBITMQ_PORT', '5672'))
+
+    logger.debug(f"Connecting to RabbitMQ at {host}:{port}")
+
+    return pika.BlockingConnection(
+        pika.ConnectionParameters(
+            host=host,
+            port=port,
+            credentials=credentials,
+            heartbeat=60,
         )
-        
-        connection.close()
-        print(f"✅ Published event to 'expense_events' queue: {event_type}")
-    except Exception as e:
-        import traceback
-        print(f"⚠️ Failed to publish event: {e}")
-        traceback.print_exc()
\ No newline at end of file
+    )
@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Optional, Sequence
+
+from sqlalchemy import Row
+
+# Rows fetched per round trip from the server-side cursor (and written per chunk)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPENSE_EXPORT_BATCH_SIZE", "1000"))
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPENSE_EXPORT_GZIP_LEVEL", "6"))
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_COLUMNS = ["id", "date", "amount", "category_id", "category_name", "description", "created_at", "updated_at"]
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Whether an Accept-Encoding header allows gzip (and does not give it q=0)"""
+    for coding in (accept_encoding or "").lower().split(","):
+        name, _, params = coding.partition(";")
+        if name.strip() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def csv_chunk(rows: Sequence[Row]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if value is None else export_value(value) for value in (getattr(row, c) for c in EXPORT_COLUMNS)])
+    return buffer.getvalue()
+
+
+def ndjson_chunk(rows: Sequence[Row]) -> str:
+    return "".join(
+        json.dumps({column: export_value(getattr(row, column)) for column in EXPORT_COLUMNS}) + "\n" for row in rows
+    )
+
+
+async def export_body(partitions: AsyncIterator[Sequence[Row]], export_format: str, compress: bool) -> AsyncIterator[bytes]:
+    """Encode each batch of rows as soon as it is fetched, gzip-compressing the stream if asked"""
+    # wbits=31: a gzip container around the deflate stream
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+    to_text = csv_chunk if export_format == "csv" else ndjson_chunk
+
+    def encode(text: str) -> bytes:
+        data = text.encode()
+        return compressor.compress(data) if compressor is not None else data
+
+    if export_format == "csv":
+        header = encode(",".join(EXPORT_COLUMNS) + "\r\n")
+        if header:
+            yield header
+    async for rows in partitions:
+        data = encode(to_text(rows))
+        if data:
+            yield data
+    if compressor is not None:
+        yield compressor.flush()
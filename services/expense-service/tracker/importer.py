@@ -0,0 +1,120 @@
+import codecs
+import csv
+import json
+import os
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+from pydantic import ValidationError
+
+from tracker.schemas import ExpenseCreate
+
+# Valid rows are inserted (and announced in one event) per batch of this size
+IMPORT_BATCH_SIZE = int(os.getenv("EXPENSE_IMPORT_BATCH_SIZE", "1000"))
+# Rejected rows beyond this many are counted but not itemised in the report
+IMPORT_MAX_ERRORS = int(os.getenv("EXPENSE_IMPORT_MAX_ERRORS", "100"))
+
+# A parsed upload record: (line number, fields, error); fields is None when error is set
+Record = Tuple[int, Optional[dict], Optional[str]]
+
+CONTENT_TYPES = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+
+
+def import_format(content_type: str, requested: Optional[str] = None) -> Optional[str]:
+    """Upload format from the `format` query parameter, else from the Content-Type"""
+    if requested:
+        return requested.lower() if requested.lower() in ("ndjson", "csv") else None
+    return CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+
+
+async def text_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a streamed UTF-8 body and yield it line by line as the chunks arrive"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """One JSON object per line; blank lines are skipped"""
+    line_no = 0
+    async for line in text_lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            fields = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(fields, dict):
+            yield line_no, None, "Expected a JSON object"
+            continue
+        yield line_no, fields, None
+
+
+async def csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Record]:
+    """CSV with a header row; empty cells are treated as missing"""
+    header = None
+    record, start = [], 0
+    line_no = 0
+    async for line in text_lines(chunks):
+        line_no += 1
+        if not record:
+            start = line_no
+        record.append(line)
+        text = "\n".join(record)
+        # An odd number of quotes means a quoted field continues on the next line
+        if text.count('"') % 2:
+            continue
+        record = []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield start, {name: value for name, value in zip(header, values) if value != ""}, None
+    if record:
+        yield start, None, "Unterminated quoted field"
+
+
+RECORD_READERS = {"ndjson": ndjson_records, "csv": csv_records}
+
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}" for detail in error.errors()
+    )
+
+
+def expense_from_record(fields: dict, category_ids: Set[int], category_names: Dict[str, int]) -> ExpenseCreate:
+    """Validate one record as an ExpenseCreate, resolving a `category` name to its id.
+
+    Raises ValueError with a readable message for invalid rows.
+    """
+    fields = dict(fields)
+    name = fields.pop("category", None)
+    if fields.get("category_id") is None and name is not None:
+        fields["category_id"] = category_names.get(str(name).strip())
+        if fields["category_id"] is None:
+            raise ValueError(f"Unknown category {name!r}")
+    try:
+        expense = ExpenseCreate.model_validate(fields)
+    except ValidationError as e:
+        raise ValueError(validation_message(e))
+    if expense.category_id not in category_ids:
+        raise ValueError(f"category_id {expense.category_id} not found")
+    return expense
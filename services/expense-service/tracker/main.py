@@ -1,7 +1,9 @@
-from fastapi import FastAPI, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from tracker.database import get_db
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple, Union
+from tracker.database import SessionLocal, get_db
 from tracker.schemas import (
     CategoryBase,
     CategoryCreate,
@@ -11,11 +13,25 @@ from tracker.schemas import (
     ExpenseCreate,
     ExpenseResponse,
     ExpenseUpdate,
-    ExpenseWithCategory
+    ExpenseWithCategory,
+    ExpensePage,
+    ImportRejection,
+    ImportReport
 )
 from tracker.models import Base, Expense, Category
-from tracker.events import publish_event
+from tracker.events import add_event
 from tracker.dependencies import get_user_id 
+from tracker.exporter import EXPORT_BATCH_SIZE, EXPORT_MEDIA_TYPES, accepts_gzip, export_body
+from tracker.importer import (
+    IMPORT_BATCH_SIZE,
+    IMPORT_MAX_ERRORS,
+    RECORD_READERS,
+    expense_from_record,
+    import_format
+)
+from tracker.pagination import decode_cursor, encode_cursor
+from tracker.tracing import TracingMiddleware, log_context, tracer
+from tracker.jsonlog import configure_logging
 from datetime import datetime, timezone
 
 
@@ -25,6 +41,10 @@ app = FastAPI(
     version="0.0.1"
 )
 
+configure_logging("expense-service", context=log_context)
+tracer.configure("expense-service")
+app.add_middleware(TracingMiddleware)
+
 
 @app.get("/health")
 async def health_check():
@@ -40,19 +60,19 @@ async def health_check():
 )
 async def create_category(
     category: CategoryCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """create a new expense category"""
     category_name = category.name
     # check if category_name already exists
-    existing = db.query(Category).filter(Category.name == category_name).first()
+    existing = await db.scalar(select(Category).where(Category.name == category_name))
     if existing:
         raise HTTPException(status_code=400, detail="Category already exists!")
     
     db_category = Category(**category.model_dump())
     db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
+    await db.commit()
+    await db.refresh(db_category)
 
     response_data = {
         "success": True,
@@ -63,29 +83,73 @@ async def create_category(
     return response_data
 
 @app.get("/api/expenses/categories", response_model=List[CategoryResponse])
-async def list_categories(db: Session = Depends(get_db)):
+async def list_categories(db: AsyncSession = Depends(get_db)):
     """List all exptense categories"""
-    categories = db.query(Category).all()
+    categories = (await db.scalars(select(Category))).all()
     return categories 
 
 @app.get("/api/expenses/categories/{category_id}", response_model=CategoryResponse)
-async def get_category(category_id: int, db: Session = Depends(get_db)):
+async def get_category(category_id: int, db: AsyncSession = Depends(get_db)):
     """Get a specific category by its id"""
-    category = db.query(Category).filter(Category.id == category_id).first()
+    category = await db.get(Category, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found!")
     return category
 
 
+def expenses_with_category():
+    """Select the ExpenseWithCategory columns, joining the category name in the same statement"""
+    return select(
+        Expense.id,
+        Expense.user_id,
+        Expense.amount,
+        Expense.category_id,
+        Expense.description,
+        Expense.date,
+        Expense.created_at,
+        Expense.updated_at,
+        func.coalesce(Category.name, "Unknown").label("category_name"),
+    ).outerjoin(Category, Category.id == Expense.category_id)
+
+
+def expense_listing(
+    user_id: str,
+    category_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+):
+    """A user's expenses matching the list filters, newest first (past the `after` (date, id) keyset)"""
+    query = expenses_with_category().where(Expense.user_id == user_id)
+
+    # Apply filters 
+    if category_id:
+        query = query.where(Expense.category_id == category_id)
+    if start_date:
+        query = query.where(Expense.date >= start_date)
+    if end_date:
+        query = query.where(Expense.date <= end_date)
+    if min_amount:
+        query = query.where(Expense.amount >= min_amount)
+    if max_amount:
+        query = query.where(Expense.amount <= max_amount)
+    if after is not None:
+        query = query.where(tuple_(Expense.date, Expense.id) < tuple_(*after))
+
+    return query.order_by(Expense.date.desc(), Expense.id.desc())
+
+
 # expense realted endpoints
 @app.post("/api/expenses", response_model=ExpenseResponse, status_code=status.HTTP_201_CREATED)
 async def create_expense(
     expense: ExpenseCreate,
     user_id: str = Depends(get_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new expense"""
-    category = db.query(Category).filter(Category.id == expense.category_id).first()
+    category = await db.get(Category, expense.category_id)
     if not category:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="category not found!")
     
@@ -95,22 +159,96 @@ async def create_expense(
 
     db_expense = Expense(**expense_data, user_id=user_id)
     db.add(db_expense)
-    db.commit()
-    db.refresh(db_expense)
+    await db.flush()
 
-    # publish evvent to queue
-    publish_event('expense.created', {
+    # event goes to the outbox in the same transaction; the relay publishes it
+    add_event(db, 'expense.created', {
         'expense_id': db_expense.id,
         'user_id': user_id,
         'amount': db_expense.amount,
         'category_id': db_expense.category_id,
         'date': db_expense.date.isoformat()
     })
+    await db.commit()
+    await db.refresh(db_expense)
 
     return db_expense
 
 
-@app.get("/api/expenses", response_model=List[ExpenseWithCategory])
+async def insert_expense_batch(db: AsyncSession, user_id: str, batch: List[dict]) -> int:
+    """Insert one batch of imported rows in a multi-row INSERT and announce them in one event"""
+    rows = (await db.execute(
+        insert(Expense).returning(Expense.id, Expense.amount, Expense.category_id, Expense.date),
+        batch
+    )).all()
+
+    # One compact event per batch instead of one expense.created per row
+    add_event(db, 'expense.imported', {
+        'user_id': user_id,
+        'fields': ['expense_id', 'amount', 'category_id', 'date'],
+        'expenses': [[row.id, row.amount, row.category_id, row.date.isoformat()] for row in rows]
+    })
+    await db.commit()
+    return len(rows)
+
+
+@app.post("/api/expenses/import", response_model=ImportReport)
+async def import_expenses(
+    request: Request,
+    format: Optional[str] = None,
+    user_id: str = Depends(get_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """Bulk-import expenses from a streamed NDJSON or CSV upload.
+
+    Rows are validated as ExpenseCreate while the body streams in (a `category`
+    name may replace `category_id`) and loaded in batches; each batch is committed
+    on its own. The report counts accepted and rejected rows, with the line and
+    reason of the first rejections.
+    """
+    upload_format = import_format(request.headers.get("content-type", ""), format)
+    if upload_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send text/csv or application/x-ndjson (or pass format=csv|ndjson)"
+        )
+
+    # Every category in one query: ids to check rows against, names to resolve
+    categories = (await db.execute(select(Category.id, Category.name))).all()
+    category_ids = {category.id for category in categories}
+    category_names = {category.name: category.id for category in categories}
+
+    report = ImportReport()
+    batch = []
+    now = datetime.now(timezone.utc)
+    try:
+        async for line, fields, error in RECORD_READERS[upload_format](request.stream()):
+            if error is None:
+                try:
+                    expense = expense_from_record(fields, category_ids, category_names)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                report.rejected += 1
+                if len(report.errors) < IMPORT_MAX_ERRORS:
+                    report.errors.append(ImportRejection(line=line, error=error))
+                continue
+
+            row = expense.model_dump()
+            row['date'] = row['date'] or now
+            batch.append({**row, 'user_id': user_id})
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                report.accepted += await insert_expense_batch(db, user_id, batch)
+                batch = []
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail=f"Body is not valid UTF-8 ({report.accepted} rows already imported)")
+
+    if batch:
+        report.accepted += await insert_expense_batch(db, user_id, batch)
+    return report
+
+
+@app.get("/api/expenses", response_model=Union[ExpensePage, List[ExpenseWithCategory]])
 async def list_expenses(
     user_id: str = Depends(get_user_id),
     category_id: Optional[int] = None,
@@ -120,55 +258,91 @@ async def list_expenses(
     max_amount: Optional[float] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    """List all expenses with filters"""
-    query = db.query(Expense).filter(Expense.user_id == user_id)
+    """List all expenses with filters.
 
-    # Apply filters 
-    if category_id:
-        query = query.filter(Expense.category_id == category_id)
-    if start_date:
-        query = query.filter(Expense.date >= start_date)
-    if end_date:
-        query = query.filter(Expense.date <= end_date)
-    if min_amount:
-        query = query.filter(Expense.amount >= min_amount)
-    if max_amount:
-        query = query.filter(Expense.amount <= max_amount)
-    
-    expenses = query.order_by(Expense.date.desc()).offset(skip).limit(limit).all()
+    Pass `cursor` (empty for the first page, then the returned `next_cursor`)
+    for keyset pagination, which returns an ExpensePage; without it the
+    original skip/limit list is returned.
+    """
+    filters = dict(
+        category_id=category_id,
+        start_date=start_date,
+        end_date=end_date,
+        min_amount=min_amount,
+        max_amount=max_amount,
+    )
+    if cursor is None:
+        rows = (await db.execute(expense_listing(user_id, **filters).offset(skip).limit(limit))).all()
+        return [row._asdict() for row in rows]
 
-    # Add category name to each expense
-    result = []
-    for expense in expenses:
-        category = db.query(Category).filter(Category.id == expense.category_id).first()
-        expense_dict = ExpenseResponse.model_validate(expense).model_dump()
-        expense_dict['category_name'] = category.name if category else "Unknown"
-        result.append(expense_dict)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    query = expense_listing(user_id, after=after, **filters)
+    # One extra row tells whether there is a next page
+    limit = max(limit, 1)
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    next_cursor = encode_cursor(rows[limit - 1].date, rows[limit - 1].id) if len(rows) > limit else None
+    return {"items": [row._asdict() for row in rows[:limit]], "next_cursor": next_cursor}
+
+@app.get("/api/expenses/export")
+async def export_expenses(
+    request: Request,
+    format: str = "csv",
+    user_id: str = Depends(get_user_id),
+    category_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+):
+    """Stream all of the user's expenses (optionally filtered) as CSV or NDJSON.
 
-    return result 
+    Rows come from a server-side cursor EXPORT_BATCH_SIZE at a time and each batch
+    is written out before the next is fetched, so memory stays flat however many
+    rows there are. The body is gzip-compressed when the client accepts it.
+    """
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    query = expense_listing(user_id, category_id=category_id, start_date=start_date, end_date=end_date)
+
+    async def batches():
+        # Own session: the stream outlives the request's dependencies
+        async with SessionLocal() as db:
+            result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            async for rows in result.partitions():
+                yield rows
+
+    compress = accepts_gzip(request.headers.get("accept-encoding"))
+    headers = {
+        "Content-Disposition": f'attachment; filename="expenses.{format}"',
+        "Cache-Control": "no-store",
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(export_body(batches(), format, compress), media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
 
 @app.get("/api/expenses/{expense_id}", response_model=ExpenseWithCategory)
 async def get_expense(
     expense_id: int,
     user_id: str = Depends(get_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific expense"""
-    expense = db.query(Expense).filter(
+    expense = (await db.execute(expenses_with_category().where(
         Expense.id == expense_id,
         Expense.user_id == user_id
-    ).first()
+    ))).first()
     
     if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
     
-    category = db.query(Category).filter(Category.id == expense.category_id).first()
-    expense_dict = ExpenseResponse.model_validate(expense).model_dump()
-    expense_dict['category_name'] = category.name if category else "Unknown"
-    
-    return expense_dict
+    return expense._asdict()
 
 
 @app.put("/api/expenses/{expense_id}", response_model=ExpenseResponse)
@@ -176,13 +350,13 @@ async def update_expense(
     expense_id: int,
     expense_update: ExpenseUpdate,
     user_id: str = Depends(get_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update an expense"""
-    db_expense = db.query(Expense).filter(
+    db_expense = await db.scalar(select(Expense).where(
         Expense.id == expense_id,
         Expense.user_id == user_id
-    ).first()
+    ))
     
     if not db_expense:
         raise HTTPException(status_code=404, detail="Expense not found")
@@ -192,18 +366,18 @@ async def update_expense(
     update_data = expense_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_expense, field, value)
-    
-    db.commit()
-    db.refresh(db_expense)
 
     # Publish event
-    publish_event('expense.updated', {
+    add_event(db, 'expense.updated', {
         'expense_id': db_expense.id,
         'user_id': user_id,
         'amount': db_expense.amount,
         'category_id': db_expense.category_id
     })
     
+    await db.commit()
+    await db.refresh(db_expense)
+    
     return db_expense
 
 
@@ -211,25 +385,25 @@ async def update_expense(
 async def delete_expense(
     expense_id: int,
     user_id: str = Depends(get_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete an expense"""
-    db_expense = db.query(Expense).filter(
+    db_expense = await db.scalar(select(Expense).where(
         Expense.id == expense_id,
         Expense.user_id == user_id
-    ).first()
+    ))
     
     if not db_expense:
         raise HTTPException(status_code=404, detail="Expense not found")
     
-    db.delete(db_expense)
-    db.commit()
+    await db.delete(db_expense)
     
     # Publish event
-    publish_event('expense.deleted', {
+    add_event(db, 'expense.deleted', {
         'expense_id': expense_id,
         'user_id': user_id
     })
+    await db.commit()
     
     return None
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, ForeignKey, Text, Index, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -25,7 +25,7 @@ class Expense(Base):
     __tablename__ = "expenses"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String(36), nullable=False, index=True)
+    user_id = Column(String(36), nullable=False)
     amount = Column(Float, nullable=False)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
     description = Column(Text, nullable=True)
@@ -35,3 +35,28 @@ class Expense(Base):
     
     def __repr__(self):
         return f"<Expense {self.id}: ${self.amount}>"
+
+
+
+class OutboxEvent(Base):
+    """An expense event committed with its change and waiting for the outbox relay to publish it"""
+    __tablename__ = "outbox_events"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    event_type = Column(String(64), nullable=False)
+    body = Column(Text, nullable=False)
+    headers = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<OutboxEvent {self.id}: {self.event_type}>"
+
+
+# Serve list_expenses: a user's rows in (date desc, id desc) order, which is also the
+# keyset cursor, with the category/amount filters answerable from the index entries
+Index(
+    "ix_expenses_user_date_id_incl",
+    Expense.user_id, Expense.date.desc(), Expense.id.desc(),
+    postgresql_include=["category_id", "amount"],
+)
+Index("ix_expenses_user_category_date_id", Expense.user_id, Expense.category_id, Expense.date.desc(), Expense.id.desc())
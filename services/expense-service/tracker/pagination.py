@@ -0,0 +1,19 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(date: datetime, expense_id: int) -> str:
+    """Opaque keyset cursor pointing just after the (date, id) of the last row of a page"""
+    raw = json.dumps([date.isoformat(), expense_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce"""
+    try:
+        date, expense_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(date), int(expense_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
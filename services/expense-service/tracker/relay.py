@@ -0,0 +1,150 @@
+import logging
+import os
+import signal
+import time
+from typing import Optional
+
+import pika
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.orm import Session
+
+from tracker.database import DATABASE_URL
+from tracker.events import EXPENSE_EVENTS_QUEUE, connect
+from tracker.jsonlog import configure_logging
+from tracker.models import OutboxEvent
+from tracker.tracing import extract, inject, log_context, span, tracer
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "0.2"))
+OUTBOX_RETRY_INTERVAL = float(os.getenv("OUTBOX_RETRY_INTERVAL", "5"))
+
+
+class OutboxRelay:
+    """Publish committed outbox rows to RabbitMQ in id order and delete them once confirmed.
+
+    Rows are claimed a batch at a time with FOR UPDATE SKIP LOCKED and published
+    over one long-lived channel in confirm mode; only rows the broker confirmed
+    are deleted, in the same transaction. Delivery is at least once: a crash
+    between a confirm and the commit publishes those rows again.
+    """
+
+    def __init__(self, engine, batch_size: int, poll_interval: float, retry_interval: float):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self.connection: Optional[pika.BlockingConnection] = None
+        self.channel = None
+        self.running = True
+        self.published = 0
+
+    def open_channel(self):
+        if self.channel is None or not self.channel.is_open:
+            self.close()
+            self.connection = connect()
+            self.channel = self.connection.channel()
+            self.channel.confirm_delivery()
+            self.channel.queue_declare(queue=EXPENSE_EVENTS_QUEUE, durable=True)
+        return self.channel
+
+    def close(self):
+        if self.connection is not None and self.connection.is_open:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+        self.connection = None
+        self.channel = None
+
+    def publish(self, channel, event: OutboxEvent):
+        with span("publish expense_events", "producer", parent=extract(event.headers), attributes={
+            "messaging.system": "rabbitmq",
+            "messaging.destination": EXPENSE_EVENTS_QUEUE,
+            "event.type": event.event_type,
+        }):
+            # Blocks until the broker confirms; raises if it nacks or the channel fails
+            channel.basic_publish(
+                exchange='',
+                routing_key=EXPENSE_EVENTS_QUEUE,
+                body=event.body,
+                properties=pika.BasicProperties(
+                    delivery_mode=2,  # make message persistent
+                    headers=inject({}),  # trace context for the consumers
+                )
+            )
+
+    def relay_batch(self) -> int:
+        """Publish the oldest unpublished batch; returns how many rows were published"""
+        error = None
+        with Session(self.engine) as db, db.begin():
+            events = db.scalars(
+                select(OutboxEvent)
+                .order_by(OutboxEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not events:
+                return 0
+
+            published = []
+            try:
+                channel = self.open_channel()
+                for event in events:
+                    self.publish(channel, event)
+                    published.append(event.id)
+            except Exception as e:
+                error = e
+            # Keep everything the broker has confirmed, even if the batch stopped early
+            if published:
+                db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(published)))
+
+        self.published += len(published)
+        if error is not None:
+            raise error
+        return len(published)
+
+    def wait(self, seconds: float):
+        # Sleep through the connection so its heartbeats keep being answered
+        if self.connection is not None and self.connection.is_open:
+            self.connection.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def run(self):
+        logger.info("Outbox relay started", extra={"batch_size": self.batch_size})
+        while self.running:
+            try:
+                count = self.relay_batch()
+            except Exception as e:
+                logger.error(f"Outbox relay failed, retrying in {self.retry_interval}s: {e}", exc_info=True)
+                self.close()
+                time.sleep(self.retry_interval)
+                continue
+            if count:
+                logger.info("Published outbox events", extra={"count": count, "sampled": True})
+            # A full batch means more may be waiting; otherwise poll again shortly
+            if count < self.batch_size:
+                self.wait(self.poll_interval)
+        self.close()
+        logger.info("Outbox relay stopped", extra={"published": self.published})
+
+    def stop(self, *args):
+        self.running = False
+
+
+def main():
+    configure_logging("expense-outbox-relay", context=log_context)
+    tracer.configure("expense-outbox-relay")
+    engine = create_engine(DATABASE_URL, pool_size=1, max_overflow=0, pool_pre_ping=True)
+    relay = OutboxRelay(engine, OUTBOX_BATCH_SIZE, OUTBOX_POLL_INTERVAL, OUTBOX_RETRY_INTERVAL)
+    signal.signal(signal.SIGTERM, relay.stop)
+    signal.signal(signal.SIGINT, relay.stop)
+    relay.run()
+    tracer.shutdown()
+
+
+# python -m tracker.relay
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class CategoryBase(BaseModel):
@@ -63,3 +63,22 @@ class ExpenseResponse(ExpenseBase):
 class ExpenseWithCategory(ExpenseResponse):
     """Schema for expense with category details"""
     category_name: str
+
+
+class ExpensePage(BaseModel):
+    """One page of a cursor-paginated expense listing"""
+    items: List[ExpenseWithCategory]
+    next_cursor: Optional[str] = None
+
+
+class ImportRejection(BaseModel):
+    """A row of an import that was not loaded"""
+    line: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    """Outcome of a bulk expense import"""
+    accepted: int = 0
+    rejected: int = 0
+    errors: List[ImportRejection] = []
@@ -5,6 +5,7 @@ import threading
 import asyncio
 import time
 import logging
+from tracing import extract, span
 from email_utils import (
     send_email,
     get_welcome_email_template,
@@ -12,11 +13,6 @@ from email_utils import (
     get_expense_confirmation_template
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
@@ -89,7 +85,7 @@ def process_expense_event(event_type: str, data: dict):
     # 2. Check user notification preferences
     # 3. Send appropriate notifications
     
-    print(f"📨 Expense event received: {event_type}")
+    logger.info("Expense event received", extra={"event_type": event_type, "sampled": True})
     # For now, just log the event
     # In production, implement email notifications based on user preferences
 
@@ -118,11 +114,19 @@ def consume_user_events():
         logger.info("User events consumer connected to RabbitMQ")
         
         def callback(ch, method, properties, body):
+            with span("consume user_events", "consumer", parent=extract(properties.headers), attributes={
+                "messaging.system": "rabbitmq",
+                "messaging.destination": "user_events",
+            }) as consume_span:
+                handle(ch, method, body, consume_span)
+
+        def handle(ch, method, body, consume_span):
             try:
-                logger.info(f"Received user event: {body}")
+                logger.debug("Received user event", extra={"bytes": len(body)})
                 message = json.loads(body)
                 event_type = message.get('event_type')
                 data = message.get('data')
+                consume_span.set_attribute("event.type", event_type)
                 
                 # Handle backward compatibility: data might be double-encoded JSON string
                 if isinstance(data, str):
@@ -140,6 +144,7 @@ def consume_user_events():
                 
             except Exception as e:
                 logger.error(f"Error processing user event: {e}", exc_info=True)
+                consume_span.record_error(e)
                 ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
         
         channel.basic_qos(prefetch_count=1)
@@ -176,18 +181,27 @@ def consume_expense_events():
         logger.info("Expense events consumer connected to RabbitMQ")
         
         def callback(ch, method, properties, body):
+            with span("consume expense_events", "consumer", parent=extract(properties.headers), attributes={
+                "messaging.system": "rabbitmq",
+                "messaging.destination": "expense_events",
+            }) as consume_span:
+                handle(ch, method, body, consume_span)
+
+        def handle(ch, method, body, consume_span):
             try:
-                logger.info(f"Received expense event: {body}")
+                logger.debug("Received expense event", extra={"bytes": len(body)})
                 message = json.loads(body)
                 event_type = message.get('event_type')
                 data = message.get('data')
+                consume_span.set_attribute("event.type", event_type)
                 
                 process_expense_event(event_type, data)
                 ch.basic_ack(delivery_tag=method.delivery_tag)
-                logger.info(f"Successfully processed {event_type} event")
+                logger.info(f"Successfully processed {event_type} event", extra={"sampled": True})
                 
             except Exception as e:
                 logger.error(f"Error processing expense event: {e}", exc_info=True)
+                consume_span.record_error(e)
                 ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
         
         channel.basic_qos(prefetch_count=1)
@@ -202,7 +216,7 @@ def consume_expense_events():
 
 def init_consumers():
     """Initialize all consumers in background threads"""
-    logger.info("🔧 Initializing notification consumers...")
+    logger.info("Initializing notification consumers...")
     
     # Wait for RabbitMQ to be ready
     if not wait_for_rabbitmq():
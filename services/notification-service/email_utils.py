@@ -1,8 +1,11 @@
 import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 
 async def send_email(to_email: str, subject: str, body: str, html: bool = False):
     """Send email notification"""
@@ -35,11 +38,11 @@ async def send_email(to_email: str, subject: str, body: str, html: bool = False)
             start_tls=True
         )
         
-        print(f"✅ Email sent to {to_email}")
+        logger.info(f"Email sent to {to_email}")
         return True
         
     except Exception as e:
-        print(f"❌ Failed to send email: {e}")
+        logger.warning(f"Failed to send email: {e}")
         return False
 
 
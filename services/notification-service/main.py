@@ -3,13 +3,11 @@ from pydantic import BaseModel, EmailStr
 from typing import Optional
 from consumer import init_consumers
 from email_utils import send_email
+from tracing import TracingMiddleware, log_context, tracer
+from jsonlog import configure_logging
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_logging("notification-service", context=log_context)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
@@ -18,6 +16,9 @@ app = FastAPI(
     version="1.0.0"
 )
 
+tracer.configure("notification-service")
+app.add_middleware(TracingMiddleware)
+
 
 class EmailNotification(BaseModel):
     """Schema for email notification"""
@@ -31,12 +32,12 @@ class EmailNotification(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     """Initialize consumers on startup"""
-    logger.info("🚀 Notification Service starting up...")
+    logger.info("Notification Service starting up...")
     try:
         init_consumers()
-        logger.info("✅ Notification Service startup complete")
+        logger.info("Notification Service startup complete")
     except Exception as e:
-        logger.error(f"❌ Failed to initialize consumers: {e}", exc_info=True)
+        logger.error(f"Failed to initialize consumers: {e}", exc_info=True)
 
 
 @app.get("/health")
@@ -0,0 +1,330 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Minimal W3C trace-context propagation and span recording, shared verbatim by every
+# service. Finished spans are exported as OTLP/JSON (one ExportTraceServiceRequest per
+# line) to TRACE_EXPORT_FILE and/or POSTed to OTEL_EXPORTER_OTLP_ENDPOINT/v1/traces
+# from a background thread, so request handling never waits on the exporter.
+TRACEPARENT = "traceparent"
+
+logger = logging.getLogger(__name__)
+
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class SpanContext:
+    def __init__(self, trace_id: str, span_id: str, sampled: bool = True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C traceparent header; None if absent or malformed"""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1] + parts[2], 16)
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return SpanContext(parts[1], parts[2], bool(flags & 1))
+
+
+class Span:
+    def __init__(self, name: str, kind: str, parent: Optional[SpanContext], attributes: Optional[dict] = None):
+        sampled = parent.sampled if parent is not None else random.random() < tracer.sample_ratio
+        self.context = SpanContext(
+            parent.trace_id if parent is not None else "%032x" % random.getrandbits(128),
+            "%016x" % random.getrandbits(64),
+            sampled,
+        )
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        self.token = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.error = str(error) or error.__class__.__name__
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if self.context.sampled:
+                tracer.export(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": SPAN_KINDS.get(self.kind, 1),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_attribute(key, value) for key, value in self.attributes.items() if value is not None],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 0},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Tracer:
+    """Process-wide span exporter (no-op until configured with a destination)"""
+
+    def __init__(self):
+        self.service_name = "unknown"
+        self.sample_ratio = 1.0
+        self.export_file: Optional[str] = None
+        self.otlp_endpoint: Optional[str] = None
+        self.queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self.thread: Optional[threading.Thread] = None
+        self.flush_interval = 1.0
+        self.max_batch = 512
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.export_file or self.otlp_endpoint)
+
+    def configure(self, service_name: str):
+        self.service_name = os.getenv("SERVICE_NAME", service_name)
+        self.sample_ratio = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+        self.export_file = os.getenv("TRACE_EXPORT_FILE") or None
+        endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+        self.otlp_endpoint = endpoint.rstrip("/") + "/v1/traces" if endpoint else None
+        if self.enabled and self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="trace-exporter", daemon=True)
+            self.thread.start()
+            atexit.register(self.shutdown)
+
+    def export(self, span: Span):
+        if self.enabled:
+            self.queue.put(span)
+
+    def run(self):
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    span = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stop = True
+                    break
+                batch.append(span)
+            if batch:
+                self.write(batch)
+            if stop:
+                return
+
+    def write(self, batch):
+        payload = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": [_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{"scope": {"name": "finance-flux.tracing"}, "spans": [span.to_otlp() for span in batch]}],
+            }]
+        })
+        try:
+            if self.export_file:
+                with open(self.export_file, "a") as f:
+                    f.write(payload + "\n")
+            if self.otlp_endpoint:
+                request = urllib.request.Request(self.otlp_endpoint, data=payload.encode(), headers={"Content-Type": "application/json"})
+                urllib.request.urlopen(request, timeout=5).close()
+        except Exception as e:
+            logger.warning(f"Trace export failed: {e}")
+
+    def shutdown(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout=5)
+            self.thread = None
+
+
+tracer = Tracer()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def log_context() -> dict:
+    """Trace and span id of the current span, for correlating log lines"""
+    current = _current.get()
+    if current is None:
+        return {}
+    return {"trace_id": current.context.trace_id, "span_id": current.context.span_id}
+
+
+def start_span(name: str, kind: str = "internal", parent: Optional[SpanContext] = None, attributes: Optional[dict] = None) -> Span:
+    """Start a span (child of `parent`, else of the current span) and make it current"""
+    if parent is None and _current.get() is not None:
+        parent = _current.get().context
+    span = Span(name, kind, parent, attributes)
+    span.token = _current.set(span)
+    return span
+
+
+def start_child(name: str, kind: str = "client", attributes: Optional[dict] = None) -> Span:
+    """Start a child of the current span without making it current (for callbacks)"""
+    current = _current.get()
+    return Span(name, kind, current.context if current is not None else None, attributes)
+
+
+def finish_span(span: Span):
+    span.end()
+    if span.token is not None:
+        try:
+            _current.reset(span.token)
+        except ValueError:
+            # Ended from a different context (e.g. a streamed response's background task)
+            pass
+        span.token = None
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", parent: Optional[SpanContext] = None, attributes: Optional[dict] = None):
+    current = start_span(name, kind, parent, attributes)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        finish_span(current)
+
+
+def inject(headers: Dict[str, str], span_: Optional[Span] = None) -> Dict[str, str]:
+    """Add the traceparent of `span_` (default: current span) to a header/property dict"""
+    span_ = span_ or _current.get()
+    if span_ is not None:
+        headers[TRACEPARENT] = span_.context.traceparent()
+    return headers
+
+
+def extract(headers) -> Optional[SpanContext]:
+    """Read the parent span context from HTTP headers or AMQP message headers"""
+    if not headers:
+        return None
+    value = headers.get(TRACEPARENT)
+    if isinstance(value, bytes):
+        value = value.decode("latin-1")
+    return parse_traceparent(value)
+
+
+class TracingMiddleware:
+    """ASGI middleware recording a server span per HTTP request.
+
+    Continues the caller's trace from the traceparent header unless
+    `trust_incoming` is False (the public edge always starts a new trace), and
+    returns the trace id in an X-Trace-Id response header.
+    """
+
+    def __init__(self, app, trust_incoming: bool = True):
+        self.app = app
+        self.trust_incoming = trust_incoming
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        parent = None
+        if self.trust_incoming:
+            parent = parse_traceparent(_header(scope, b"traceparent"))
+        current = start_span(f"{scope['method']} {scope['path']}", "server", parent, {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        })
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                current.set_attribute("http.status_code", message["status"])
+                message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", current.context.trace_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except BaseException as e:
+            current.record_error(e)
+            raise
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                current.name = f"{scope['method']} {route}"
+                current.set_attribute("http.route", route)
+            finish_span(current)
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def instrument_engine(engine):
+    """Record a client span for every SQL statement run through a SQLAlchemy engine"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("trace_spans", []).append(start_span(
+            statement.split(None, 1)[0].upper() if statement else "SQL", "client",
+            attributes={"db.system": engine.dialect.name, "db.statement": statement[:1000]},
+        ))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            current = spans.pop()
+            current.set_attribute("db.rows", cursor.rowcount)
+            finish_span(current)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        spans = exception_context.connection.info.get("trace_spans") if exception_context.connection is not None else None
+        if spans:
+            current = spans.pop()
+            current.record_error(exception_context.original_exception)
+            finish_span(current)